@@ -0,0 +1,247 @@
+"""
+Admission control for expensive model endpoints.
+
+- Request size limits (texts per request, characters per text).
+- Token-bucket rate limits keyed by user or client IP. Buckets live in process
+  memory by default; set ADMISSION_STORE to a SQLite file path to share them
+  between workers. A request larger than the burst is admitted from a full
+  bucket and leaves it in debt, so it still pays its full cost.
+- A global cap on concurrent model calls. Waiters are served interactive
+  before bulk, and round-robin between callers within a priority, so one
+  caller's large batch cannot starve everyone else.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+load_dotenv("config.env")
+
+MAX_TEXTS_PER_REQUEST = int(os.getenv("SUMMARIZE_MAX_TEXTS", "16"))
+MAX_CHARS_PER_TEXT = int(os.getenv("SUMMARIZE_MAX_CHARS", "20000"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("SUMMARIZE_RATE_PER_MINUTE", "30"))  # texts per minute
+RATE_LIMIT_BURST = float(os.getenv("SUMMARIZE_RATE_BURST", "16"))
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "1"))
+INTERACTIVE_MAX_TEXTS = int(os.getenv("INTERACTIVE_MAX_TEXTS", "2"))
+ADMISSION_STORE = os.getenv("ADMISSION_STORE", "")
+
+BUCKET_SWEEP_SECONDS = 60
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+class MemoryBucketStore:
+    """Token buckets held in this process."""
+    blocking = False
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+
+    def _sweep(self, now: float, capacity: float, rate: float):
+        # A bucket that has refilled is the same as no bucket, so forget it
+        full = [
+            key for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * rate >= capacity
+        ]
+        for key in full:
+            del self._buckets[key]
+        self._swept = now
+
+    def consume(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Take cost tokens from a bucket; return 0 on success or seconds to wait.
+
+        Costs above capacity need a full bucket and drive it negative.
+        """
+        now = time.monotonic()
+        needed = min(cost, capacity)
+        with self._lock:
+            if now - self._swept >= BUCKET_SWEEP_SECONDS:
+                self._sweep(now, capacity, rate)
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= needed:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (needed - tokens) / rate
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file shared by every worker on the host."""
+    blocking = True  # may wait on the file lock, so run off the event loop
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def consume(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        now = time.time()  # wall clock, comparable across processes
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            needed = min(cost, capacity)
+            wait = 0.0
+            if tokens >= needed:
+                tokens -= cost
+            else:
+                wait = (needed - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+class RateLimiter:
+    """Token-bucket limiter: `burst` tokens refilled at `per_minute` per minute."""
+
+    def __init__(self, per_minute: float, burst: float, store=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.store = store or MemoryBucketStore()
+
+    async def check(self, key: str, cost: float = 1.0):
+        """Consume tokens or raise 429 with a Retry-After header."""
+        if self.rate <= 0:
+            return
+        args = (key, cost, self.capacity, self.rate)
+        if self.store.blocking:
+            wait = await run_in_threadpool(self.store.consume, *args)
+        else:
+            wait = self.store.consume(*args)
+        if wait > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, please retry later",
+                headers={"Retry-After": str(int(wait) + 1)},
+            )
+
+class ModelScheduler:
+    """Caps concurrent model calls with priority and per-caller fair queuing."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self._running = 0
+        # priority -> caller key -> waiting futures (insertion order is the round-robin order)
+        self._waiting: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for callers in self._waiting.values() for q in callers.values())
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in sorted(self._waiting):
+            callers = self._waiting[priority]
+            while callers:
+                key, queue = callers.popitem(last=False)
+                future = queue.popleft()
+                if queue:
+                    callers[key] = queue  # back of the line for this caller's next item
+                if not future.cancelled():
+                    return future
+        return None
+
+    def _release(self):
+        future = self._next_waiter()
+        if future is None:
+            self._running -= 1
+        else:
+            future.set_result(None)  # hand the slot over directly
+
+    def _discard(self, key: str, priority: int, future: asyncio.Future):
+        queue = self._waiting.get(priority, {}).get(key)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiting[priority][key]
+
+    async def acquire(self, key: str, priority: int = PRIORITY_INTERACTIVE):
+        if self._running < self.concurrency and not self.queued:
+            self._running += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(priority, OrderedDict()).setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # slot was granted as we were cancelled
+            else:
+                self._discard(key, priority, future)
+            raise
+
+    def release(self):
+        self._release()
+
+    @asynccontextmanager
+    async def slot(self, key: str, priority: int = PRIORITY_INTERACTIVE):
+        """Hold one model slot for the duration of the block."""
+        await self.acquire(key, priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+def client_key(request: Request, user=None) -> str:
+    """Identify the caller for rate limiting and fair queuing."""
+    if user is not None:
+        return f"user:{user.id}"
+    host = request.client.host if request.client else "unknown"
+    return f"ip:{host}"
+
+def check_summarize_limits(texts: List[str], max_texts: int = MAX_TEXTS_PER_REQUEST):
+    """Reject requests that exceed the size limits."""
+    if len(texts) > max_texts:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {max_texts} texts per request"
+        )
+    for text in texts:
+        if len(text) > MAX_CHARS_PER_TEXT:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Each text must be at most {MAX_CHARS_PER_TEXT} characters"
+            )
+
+def request_priority(texts: List[str]) -> int:
+    return PRIORITY_INTERACTIVE if len(texts) <= INTERACTIVE_MAX_TEXTS else PRIORITY_BULK
+
+summarize_rate_limiter = RateLimiter(
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_BURST,
+    SQLiteBucketStore(ADMISSION_STORE) if ADMISSION_STORE else None,
+)
+model_scheduler = ModelScheduler(MODEL_CONCURRENCY)
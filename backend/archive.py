@@ -0,0 +1,230 @@
+"""
+Historical article archive.
+
+Every new or changed article seen by ingestion is upserted into the `articles`
+table with its publish time parsed to UTC. Queries use keyset (cursor)
+pagination over the composite (category|source, published_at, id) indexes, so
+each page is an index range scan whatever the archive size. A retention job
+deletes rows older than ARCHIVE_RETENTION_DAYS and compacts the database.
+"""
+import base64
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+
+from articles import Article
+from database import ArchivedArticle, SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "365"))
+ARCHIVE_COMPACT_INTERVAL = int(os.getenv("ARCHIVE_COMPACT_INTERVAL", str(24 * 3600)))
+DELETE_BATCH_SIZE = 900  # ids bound into IN (...), under SQLite's parameter limit
+UPSERT_BATCH_SIZE = 50
+VACUUM_THRESHOLD = 50000  # rows deleted before the file is worth rewriting
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """Parse an RFC 822 or ISO 8601 timestamp to naive UTC."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a query bound to naive UTC."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def encode_cursor(published_at: datetime, article_id: str) -> str:
+    raw = f"{published_at.isoformat()}|{article_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor; raises ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        published, article_id = raw.split("|", 1)
+        return datetime.fromisoformat(published), article_id
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def _row_values(article: Article, now: datetime) -> dict:
+    return {
+        "id": article.id,
+        "title": article.title,
+        "description": article.description,
+        "url": article.url,
+        "source": article.source,
+        "category": article.category,
+        "summary": article.summary,
+        "published_raw": article.published_at,
+        "published_at": parse_timestamp(article.published_at) or now,
+        "ingested_at": now,
+    }
+
+def _upsert_statement(rows: List[dict]):
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    stmt = insert(ArchivedArticle).values(rows)
+    updated = {
+        name: stmt.excluded[name]
+        for name in ("title", "description", "url", "category", "summary", "published_raw", "published_at")
+    }
+    return stmt.on_conflict_do_update(index_elements=["id"], set_=updated)
+
+def archive_articles(articles: List[Article]) -> int:
+    """Insert or update articles in the archive; returns the number written."""
+    if not articles:
+        return 0
+    now = datetime.utcnow()
+    rows = [_row_values(article, now) for article in articles]
+    db = SessionLocal()
+    try:
+        if _upsert_statement(rows[:1]) is not None:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                db.execute(_upsert_statement(rows[i:i + UPSERT_BATCH_SIZE]))
+        else:
+            for row in rows:
+                db.merge(ArchivedArticle(**row))
+        db.commit()
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def query_archive(
+    db: Session,
+    categories: Optional[List[str]] = None,
+    source: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 10
+) -> Tuple[List[Article], Optional[str]]:
+    """Return one page of archived articles (newest first) and the next cursor."""
+    query = select(ArchivedArticle)
+    if categories:
+        query = query.where(ArchivedArticle.category.in_(categories))
+    if source:
+        query = query.where(ArchivedArticle.source == source)
+    if start is not None:
+        query = query.where(ArchivedArticle.published_at >= to_utc(start))
+    if end is not None:
+        query = query.where(ArchivedArticle.published_at < to_utc(end))
+    if cursor:
+        published_at, article_id = decode_cursor(cursor)
+        # Row-value comparison keeps this an index range scan
+        query = query.where(
+            tuple_(ArchivedArticle.published_at, ArchivedArticle.id) < tuple_(published_at, article_id)
+        )
+    query = query.order_by(ArchivedArticle.published_at.desc(), ArchivedArticle.id.desc()).limit(limit + 1)
+    rows = db.execute(query).scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].published_at, rows[-1].id)
+    articles = [
+        Article(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            url=row.url,
+            source=row.source,
+            published_at=row.published_raw,
+            category=row.category,
+            summary=row.summary,
+        )
+        for row in rows
+    ]
+    return articles, next_cursor
+
+def recent_articles(since: datetime, limit: int = 20000) -> List[Article]:
+    """Articles published since a time, oldest first (used to warm up trending terms)."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(ArchivedArticle.id, ArchivedArticle.title, ArchivedArticle.description, ArchivedArticle.published_raw)
+            .where(ArchivedArticle.published_at >= to_utc(since))
+            .order_by(ArchivedArticle.published_at.desc(), ArchivedArticle.id.desc())
+            .limit(limit)
+        ).all()
+    finally:
+        db.close()
+    return [
+        Article(id=row.id, title=row.title, description=row.description, url="", source="", published_at=row.published_raw)
+        for row in reversed(rows)
+    ]
+
+def compact_archive(retention_days: int = ARCHIVE_RETENTION_DAYS) -> int:
+    """Delete articles past the retention window and reclaim space."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    db = SessionLocal()
+    try:
+        while True:
+            # Delete in batches so writers are never blocked for long
+            ids = db.execute(
+                select(ArchivedArticle.id)
+                .where(ArchivedArticle.published_at < cutoff)
+                .limit(DELETE_BATCH_SIZE)
+            ).scalars().all()
+            if not ids:
+                break
+            db.execute(delete(ArchivedArticle).where(ArchivedArticle.id.in_(ids)))
+            db.commit()
+            deleted += len(ids)
+    finally:
+        db.close()
+
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            if deleted >= VACUUM_THRESHOLD:
+                conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("PRAGMA optimize")
+    logger.info(f"Archive compaction removed {deleted} articles older than {cutoff:%Y-%m-%d}")
+    return deleted
+
+class ArchiveWriter:
+    """Ingestion hook that archives articles and periodically compacts."""
+
+    def __init__(self, compact_interval: int = ARCHIVE_COMPACT_INTERVAL):
+        self.compact_interval = compact_interval
+        self._last_compaction = 0.0
+
+    def __call__(self, articles: List[Article]):
+        try:
+            written = archive_articles(articles)
+            if written:
+                logger.info(f"Archived {written} new or changed articles")
+        except Exception as e:
+            logger.error(f"Error archiving articles: {str(e)}")
+        if time.time() - self._last_compaction >= self.compact_interval:
+            self._last_compaction = time.time()
+            try:
+                compact_archive()
+            except Exception as e:
+                logger.error(f"Error compacting archive: {str(e)}")
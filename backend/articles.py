@@ -0,0 +1,158 @@
+"""
+Compact in-memory article representation and fast JSON encoding.
+
+Articles built from the RSS feed are trusted internal data, so they are kept in
+slotted objects instead of pydantic models and serialized straight to bytes.
+Each article caches its encoded JSON fragment, which lets list responses be
+assembled by concatenating fragments.
+"""
+import json
+from typing import Any, Iterable, List, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    """Decode JSON bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response that uses orjson when available and passes bytes through."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+class Article:
+    """A news article held in memory without validation overhead."""
+    __slots__ = (
+        "id", "title", "description", "url", "source",
+        "published_at", "category", "content", "_summary", "_fragment",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        description: str,
+        url: str,
+        source: str,
+        published_at: str,
+        category: Optional[str] = None,
+        summary: Optional[str] = None,
+        content: Optional[str] = None,
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.url = url
+        self.source = source
+        self.published_at = published_at
+        self.category = category
+        self.content = content  # extracted full text, not part of the API shape
+        self._summary = summary
+        self._fragment = None
+
+    @property
+    def summary(self) -> Optional[str]:
+        return self._summary
+
+    @summary.setter
+    def summary(self, value: Optional[str]):
+        self._summary = value
+        self._fragment = None
+
+    def to_dict(self) -> dict:
+        """Return the public API shape (matches the NewsArticle model)."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "url": self.url,
+            "source": self.source,
+            "publishedAt": self.published_at,
+            "category": self.category,
+            "summary": self._summary,
+        }
+
+    def to_record(self) -> dict:
+        """Return the API shape plus internal fields, for persistence."""
+        record = self.to_dict()
+        if self.content is not None:
+            record["content"] = self.content
+        return record
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Article":
+        """Rebuild an article from its API shape or a persisted record."""
+        return cls(
+            id=data["id"],
+            title=data["title"],
+            description=data["description"],
+            url=data["url"],
+            source=data["source"],
+            published_at=data["publishedAt"],
+            category=data.get("category"),
+            summary=data.get("summary"),
+            content=data.get("content"),
+        )
+
+    def fragment(self) -> bytes:
+        """Return the article's encoded JSON, encoding it at most once."""
+        if self._fragment is None:
+            self._fragment = dumps(self.to_dict())
+        return self._fragment
+
+
+def _join(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def encode_articles(articles: Iterable[Article]) -> bytes:
+    """Encode a list of articles as a JSON array of cached fragments."""
+    return _join(article.fragment() for article in articles)
+
+
+def encode_page(key: str, items: bytes, **meta: Any) -> bytes:
+    """Wrap an already-encoded JSON array with pagination metadata."""
+    body = dumps(meta)
+    head = b'{"' + key.encode("utf-8") + b'":' + items
+    if body == b"{}":
+        return head + b"}"
+    return head + b"," + body[1:]
+
+
+def encode_news_page(articles: List[Article], total: int, page: int, limit: int) -> bytes:
+    """Encode a NewsResponse body."""
+    return encode_page(
+        "articles",
+        encode_articles(articles),
+        total=total,
+        page=page,
+        limit=limit,
+        totalPages=(total + limit - 1) // limit,
+    )
+
+
+def encode_cluster(cluster_id: str, name: str, articles: List[Article]) -> bytes:
+    """Encode a single Cluster object."""
+    head = dumps({"id": cluster_id, "name": name})
+    return head[:-1] + b',"articles":' + encode_articles(articles) + b"}"
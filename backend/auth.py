@@ -21,6 +21,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT token security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -74,6 +75,18 @@ def get_current_user(
     
     return user
 
+def get_current_user_optional(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+) -> Optional[User]:
+    """Get the current user if a valid token was sent, otherwise None."""
+    if credentials is None:
+        return None
+    username = verify_token(credentials.credentials)
+    if username is None:
+        return None
+    return db.query(User).filter(User.username == username).first()
+
 def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark the keyword and embedding categorizers on a labeled local sample.
+
+Reads fixtures/labeled_headlines.json (a null label means "uncategorized")
+and reports accuracy, per-category recall and throughput for both
+categorize_article and EmbeddingCategorizer.
+
+Usage: python benchmark_categorizer.py [--repeat N]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+
+from sentence_transformers import SentenceTransformer
+
+from categorizer import EmbeddingCategorizer
+from ingestion import categorize_article
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "labeled_headlines.json")
+
+def report(name: str, predictions, labels, seconds: float, count: int):
+    correct = sum(p == l for p, l in zip(predictions, labels))
+    print(f"\n{name}:")
+    print(f"   accuracy: {correct / len(labels):.1%} ({correct}/{len(labels)})")
+    for category in sorted({l for l in labels if l}) + [None]:
+        rows = [i for i, l in enumerate(labels) if l == category]
+        hits = sum(predictions[i] == category for i in rows)
+        print(f"   {category or 'uncategorized':<14} recall {hits}/{len(rows)}")
+    print(f"   throughput: {count / seconds:,.0f} articles/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the sample for timing")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # categorize_article logs every article
+
+    with open(SAMPLE_PATH) as f:
+        sample = json.load(f)
+    texts = [item["text"] for item in sample]
+    labels = [item["label"] for item in sample]
+    batch = texts * args.repeat
+    print(f"Sample: {len(texts)} labeled headlines, timing over {len(batch)} articles")
+
+    start = time.perf_counter()
+    for text in batch:
+        categorize_article(text)
+    keyword_time = time.perf_counter() - start
+    report("Keyword rules", [categorize_article(text) for text in texts], labels, keyword_time, len(batch))
+
+    print("\nLoading all-MiniLM-L6-v2 ...")
+    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    categorizer = EmbeddingCategorizer(embedder)
+
+    start = time.perf_counter()
+    vectors = embedder.encode(batch, convert_to_numpy=True, normalize_embeddings=True, batch_size=64)
+    embed_time = time.perf_counter() - start
+    start = time.perf_counter()
+    categorizer.categorize_vectors(vectors)
+    score_time = time.perf_counter() - start
+
+    predictions, scores = categorizer.categorize_texts(texts)
+    report("Embedding categorizer (embedding + scoring)", predictions, labels, embed_time + score_time, len(batch))
+    print(f"   scoring alone: {len(batch) / max(score_time, 1e-9):,.0f} articles/s "
+          f"(one {len(batch)}x{vectors.shape[1]} @ {vectors.shape[1]}x{len(categorizer.names)} multiply)")
+    print("   (at ingestion the embeddings already exist, so only scoring is extra work)")
+
+    multi = categorizer.labels_above(scores)
+    print(f"   articles with more than one category above threshold: {sum(len(m) > 1 for m in multi)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-worker model loading against the shared inference server.
+
+Starts N worker processes that all run the same mix of embedding and
+summarization calls. The first run has every worker load its own models
+(the default). The second has all workers use one `inference.py` server
+through INFERENCE_SOCKET. The report covers total memory, throughput,
+request latency and, for the server, the mean merged batch size. Memory is
+proportional set size (PSS), so pages shared between processes are not
+counted twice.
+
+Usage: python benchmark_inference.py [--workers N] [--rounds R] [--mode local|shared|both]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_summarization import TOPICS, build_corpus
+from inference import EMBEDDING_MODEL, SUMMARY_MODEL, InferenceClient, RemoteEmbedder, RemoteSummarizer
+from summarization import LengthAwareSummarizer
+
+HEADLINES_PER_CALL = 8
+SUMMARY_EVERY = 4  # one summarization per this many embedding calls
+
+def pss_mb(pid: int) -> float:
+    """Proportional set size of a process, falling back to RSS."""
+    for path, field in ((f"/proc/{pid}/smaps_rollup", "Pss:"), (f"/proc/{pid}/status", "VmRSS:")):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            continue
+    return 0.0
+
+def run_worker(mode, socket_path, rounds, seed, ready, start, finish, results):
+    if mode == "local":
+        from sentence_transformers import SentenceTransformer
+        from transformers import pipeline
+
+        model = pipeline("summarization", model=SUMMARY_MODEL)
+        embedder = SentenceTransformer(EMBEDDING_MODEL)
+    else:
+        client = InferenceClient(socket_path)
+        client.wait_ready()
+        model = RemoteSummarizer(client)
+        embedder = RemoteEmbedder(client)
+    summarizer = LengthAwareSummarizer(model)
+    texts = [text for text, _ in build_corpus(rounds * 3, seed) if len(text) < 1000]
+    headlines = [f"{sentence} ({seed}-{i})" for i in range(HEADLINES_PER_CALL) for _, sentence in TOPICS]
+
+    ready.put(os.getpid())
+    start.wait()
+    latencies = {"embed": [], "summarize": []}
+    started = time.perf_counter()
+    for i in range(rounds):
+        batch = [headlines[(i * HEADLINES_PER_CALL + j) % len(headlines)] for j in range(HEADLINES_PER_CALL)]
+        call = time.perf_counter()
+        embedder.encode(batch, convert_to_numpy=True, normalize_embeddings=True)
+        latencies["embed"].append(time.perf_counter() - call)
+        if i % SUMMARY_EVERY == 0:
+            call = time.perf_counter()
+            summarizer.summarize([texts[i % len(texts)]])
+            latencies["summarize"].append(time.perf_counter() - call)
+    results.put((latencies, time.perf_counter() - started))
+    finish.wait()  # stay alive until the parent has measured memory
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+def run_mode(mode: str, workers: int, rounds: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="inference-"), "inference.sock")
+    server = None
+    extra_pids = []
+    if mode == "shared":
+        server = subprocess.Popen(
+            [sys.executable, "inference.py"],
+            env=dict(os.environ, INFERENCE_SOCKET=socket_path)
+        )
+        extra_pids.append(server.pid)
+        if not InferenceClient(socket_path).wait_ready(600):
+            server.terminate()
+            raise SystemExit("Inference server did not become ready")
+
+    ready, results = context.Queue(), context.Queue()
+    start, finish = context.Event(), context.Event()
+    processes = [
+        context.Process(target=run_worker, args=(mode, socket_path, rounds, seed, ready, start, finish, results))
+        for seed in range(workers)
+    ]
+    loading = time.perf_counter()
+    for process in processes:
+        process.start()
+    pids = [ready.get() for _ in processes]
+    load_seconds = time.perf_counter() - loading
+    idle_mb = sum(pss_mb(pid) for pid in pids + extra_pids)
+
+    start.set()
+    began = time.perf_counter()
+    outcomes = [results.get() for _ in processes]
+    wall = time.perf_counter() - began
+    busy_mb = sum(pss_mb(pid) for pid in pids + extra_pids)
+    health = InferenceClient(socket_path).health() if server else None
+
+    finish.set()
+    for process in processes:
+        process.join()
+    if server:
+        server.terminate()
+        server.wait()
+
+    embed = [latency for latencies, _ in outcomes for latency in latencies["embed"]]
+    summarize = [latency for latencies, _ in outcomes for latency in latencies["summarize"]]
+    return {
+        "load_seconds": load_seconds,
+        "idle_mb": idle_mb,
+        "busy_mb": busy_mb,
+        "wall": wall,
+        "embed": embed,
+        "summarize": summarize,
+        "health": health,
+    }
+
+def report(mode: str, result: dict):
+    embed, summarize = result["embed"], result["summarize"]
+    print(f"\n{mode}:")
+    print(f"   startup until every worker is ready: {result['load_seconds']:.1f} s")
+    print(f"   memory (PSS): {result['idle_mb']:.0f} MB idle, {result['busy_mb']:.0f} MB after the run")
+    print(f"   embedding: {len(embed) * HEADLINES_PER_CALL / result['wall']:.1f} texts/s, "
+          f"p50 {statistics.median(embed) * 1000:.0f} ms, p95 {percentile(embed, 0.95) * 1000:.0f} ms")
+    if summarize:
+        print(f"   summarization: {len(summarize) / result['wall']:.2f} texts/s, "
+              f"p50 {statistics.median(summarize) * 1000:.0f} ms, p95 {percentile(summarize, 0.95) * 1000:.0f} ms")
+    if result["health"]:
+        health = result["health"]
+        print(f"   server batches: embed mean {health['embed']['meanBatch']} texts, "
+              f"summarize mean {health['summarize']['meanBatch']} texts")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--mode", choices=("local", "shared", "both"), default="both")
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.rounds} embedding calls of {HEADLINES_PER_CALL} headlines each, "
+          f"one summarization every {SUMMARY_EVERY} calls")
+    results = {}
+    for mode in ("local", "shared"):
+        if args.mode in (mode, "both"):
+            results[mode] = run_mode(mode, args.workers, args.rounds)
+            report("Models loaded in every worker" if mode == "local" else "Shared inference server", results[mode])
+
+    if len(results) == 2:
+        local, shared = results["local"], results["shared"]
+        print(f"\nMemory: {local['busy_mb']:.0f} MB per-worker, {shared['busy_mb']:.0f} MB shared "
+              f"({local['busy_mb'] / shared['busy_mb']:.2f}x)")
+        print(f"Wall time for the same work: {local['wall']:.1f} s per-worker, {shared['wall']:.1f} s shared")
+
+if __name__ == "__main__":
+    main()
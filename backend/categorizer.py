@@ -0,0 +1,169 @@
+"""
+Embedding-based zero-shot categorizer.
+
+Each category is a prototype vector: the normalized mean embedding of a few
+example sentences. A batch of article embeddings is scored against every
+prototype with a single matrix multiply. Cosine similarities are mapped to
+per-category probabilities with a logistic curve fitted to the example
+sentences, so scores are comparable across categories and several can be
+high at once (multi-label). The top category is assigned only when its
+probability clears the threshold; otherwise the article stays uncategorized,
+like the keyword rules do.
+
+With lazy=True the example sentences are embedded on first use rather than
+at construction, for embedders that may not be reachable yet (the shared
+inference server while it loads).
+"""
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from articles import loads
+
+logger = logging.getLogger(__name__)
+
+CATEGORIZER = os.getenv("CATEGORIZER", "keyword").lower()  # keyword or embedding
+CATEGORY_EXAMPLES_FILE = os.getenv("CATEGORY_EXAMPLES_FILE", "")
+CATEGORY_THRESHOLD = float(os.getenv("CATEGORY_THRESHOLD", "0.5"))
+
+DEFAULT_EXAMPLES: Dict[str, List[str]] = {
+    "entertainment": [
+        "The film premiere drew celebrities to the red carpet.",
+        "The band announced a world tour to promote their new album.",
+        "The actress won an award for her role in the television drama.",
+        "The streaming series was renewed for another season.",
+        "Critics praised the theatre production and its director.",
+    ],
+    "sports": [
+        "The team won the championship final after extra time.",
+        "The striker scored twice as the club climbed the league table.",
+        "The tennis player reached the semi-final of the tournament.",
+        "The coach named the squad for the upcoming World Cup qualifiers.",
+        "The athlete broke the world record at the Olympics.",
+    ],
+    "crime": [
+        "Police arrested a man on suspicion of murder.",
+        "The suspect appeared in court charged with robbery and assault.",
+        "Detectives are investigating a fraud involving stolen bank details.",
+        "A gang member was jailed for drug trafficking.",
+        "Officers appealed for witnesses after a stabbing in the city centre.",
+    ],
+    "politics": [
+        "The prime minister announced a cabinet reshuffle.",
+        "Parliament voted on the government's new legislation.",
+        "The opposition party launched its election campaign.",
+        "Ministers debated the budget and tax policy.",
+        "The president met foreign leaders for diplomatic talks.",
+    ],
+}
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class EmbeddingCategorizer:
+    """Scores embeddings against per-category prototype vectors."""
+
+    def __init__(
+        self,
+        embedder,
+        examples: Optional[Dict[str, List[str]]] = None,
+        threshold: float = CATEGORY_THRESHOLD,
+        lazy: bool = False
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.names: List[str] = []
+        self._examples: Dict[str, np.ndarray] = {}
+        self._pending: Dict[str, List[str]] = {}  # examples not embedded yet
+        self.prototypes = np.zeros((0, 0), dtype=np.float32)
+        self._bias = np.zeros(0, dtype=np.float32)
+        self._scale = np.ones(0, dtype=np.float32)
+        for name, sentences in (examples or DEFAULT_EXAMPLES).items():
+            if not sentences:
+                raise ValueError(f"Category '{name}' needs at least one example sentence")
+            self.names.append(name)
+            self._pending[name] = sentences
+        if not lazy:
+            self._ensure_prototypes()
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _set_examples(self, name: str, sentences: List[str]):
+        if not sentences:
+            raise ValueError(f"Category '{name}' needs at least one example sentence")
+        if name not in self.names:
+            self.names.append(name)
+        self._examples[name] = self._embed(sentences)
+
+    def _ensure_prototypes(self):
+        """Embed any pending examples and rebuild the prototypes."""
+        if not self._pending:
+            return
+        for name in list(self._pending):
+            self._examples[name] = self._embed(self._pending[name])
+            del self._pending[name]
+        self._refresh()
+
+    def _refresh(self):
+        """Rebuild prototypes and refit the calibration from the examples."""
+        self.prototypes = _normalize(np.stack([self._examples[name].mean(axis=0) for name in self.names]))
+        bias, scale = [], []
+        for k, name in enumerate(self.names):
+            # Leave-one-in is fine here: prototypes are means of few examples, so
+            # the positives sit slightly high, which makes the calibration conservative
+            positive = self._examples[name] @ self.prototypes[k]
+            others = [self._examples[other] for other in self.names if other != name]
+            negative = np.concatenate(others) @ self.prototypes[k] if others else positive - 0.5
+            pos, neg = float(positive.mean()), float(negative.mean())
+            bias.append((pos + neg) / 2)
+            # Positives land near 0.88 and negatives near 0.12
+            scale.append(max((pos - neg) / 4, 1e-3))
+        self._bias = np.asarray(bias, dtype=np.float32)
+        self._scale = np.asarray(scale, dtype=np.float32)
+
+    def add_category(self, name: str, sentences: List[str]):
+        """Add a category (or replace its examples) from a few example sentences."""
+        self._ensure_prototypes()
+        self._set_examples(name.lower(), sentences)
+        self._refresh()
+        logger.info(f"Category '{name}' added with {len(sentences)} examples")
+
+    def score(self, vectors: np.ndarray) -> np.ndarray:
+        """Return an (articles x categories) matrix of calibrated probabilities."""
+        self._ensure_prototypes()
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        similarities = vectors @ self.prototypes.T
+        return 1.0 / (1.0 + np.exp(-(similarities - self._bias) / self._scale))
+
+    def categorize_vectors(self, vectors: np.ndarray) -> Tuple[List[Optional[str]], np.ndarray]:
+        """Assign the top category per row when it clears the threshold."""
+        scores = self.score(vectors)
+        best = scores.argmax(axis=1)
+        labels = [
+            self.names[k] if scores[row, k] >= self.threshold else None
+            for row, k in enumerate(best)
+        ]
+        return labels, scores
+
+    def categorize_texts(self, texts: List[str]) -> Tuple[List[Optional[str]], np.ndarray]:
+        """Embed texts once and categorize them as a batch."""
+        return self.categorize_vectors(self._embed(texts))
+
+    def labels_above(self, scores: np.ndarray) -> List[List[str]]:
+        """Multi-label view: every category whose probability clears the threshold."""
+        return [[self.names[k] for k in np.flatnonzero(row >= self.threshold)] for row in scores]
+
+def load_examples(path: str = CATEGORY_EXAMPLES_FILE) -> Dict[str, List[str]]:
+    """Default examples merged with extra categories from a JSON file."""
+    examples = {name: list(sentences) for name, sentences in DEFAULT_EXAMPLES.items()}
+    if path:
+        with open(path, "rb") as f:
+            for name, sentences in loads(f.read()).items():
+                examples[name.lower()] = sentences
+    return examples
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Check the full-text extraction pipeline against local HTML fixtures.
+
+Serves the fixtures/ directory from a local HTTP server, runs the concurrent
+extractor over it twice, and checks that the main body text is extracted,
+that boilerplate is dropped, and that the second pass is answered from the
+on-disk cache through conditional requests (304 Not Modified).
+"""
+import asyncio
+import functools
+import os
+import shutil
+import tempfile
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from extraction import ContentExtractor, ExtractionCache
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixtures():
+    """Start a static file server on a free local port."""
+    handler = functools.partial(QuietHandler, directory=FIXTURES_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def check(label: str, ok: bool) -> bool:
+    print(f"{'✓' if ok else '✗'} {label}")
+    return ok
+
+def main():
+    print("Testing Content Extraction...")
+    print("=" * 40)
+    server = serve_fixtures()
+    cache_dir = tempfile.mkdtemp(prefix="extraction-cache-")
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/article.html", f"{base}/missing.html"]
+    extractor = ContentExtractor(cache=ExtractionCache(cache_dir), concurrency=4, workers=1)
+    try:
+        first = asyncio.run(extractor.extract_all(urls))
+        text = first.get(urls[0], "")
+        results = [
+            check("Article body extracted", "forty million pound scheme" in text),
+            check("All body paragraphs kept", "eighteen months" in text and text.count("\n\n") == 3),
+            check("Navigation, asides and footer dropped", "Sign in" not in text and "Copyright" not in text and "Most read" not in text),
+            check("Captions dropped", "burst its banks" not in text),
+            check("Missing page skipped", urls[1] not in first and extractor.stats["failed"] == 1),
+        ]
+        second = asyncio.run(extractor.extract_all(urls[:1]))
+        results.append(check("Second pass served from cache (304)", second == {urls[0]: text} and extractor.stats["not_modified"] == 1))
+    finally:
+        extractor.close()
+        server.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\n" + "=" * 40)
+    if all(results):
+        print("🎉 Content extraction is working!")
+    else:
+        print("❌ Some checks failed. Please check the output above.")
+
+if __name__ == "__main__":
+    main()
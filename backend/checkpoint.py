@@ -0,0 +1,104 @@
+"""
+Warm restarts for the single-process snapshot store.
+
+The current snapshot (articles with their categories and summaries, the
+embedding matrix and the search index) and the summary cache are written to
+SNAPSHOT_CHECKPOINT in the shared snapshot format. This happens every
+CHECKPOINT_SECONDS when something changed, and on shutdown. On startup the
+file is memory-mapped back in, so the first requests are served warm and the
+next ingestion only processes entries that changed. A checkpoint that is
+missing, corrupted or of another format version is ignored and rebuilt.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from ingestion import SnapshotStore
+from shared_snapshot import SnapshotFormatError, load_checkpoint, write_snapshot_file
+
+load_dotenv("config.env")
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CHECKPOINT = os.getenv("SNAPSHOT_CHECKPOINT", "cache/snapshot.bin")  # empty disables
+CHECKPOINT_SECONDS = float(os.getenv("CHECKPOINT_SECONDS", "300"))
+
+class CheckpointedSnapshotStore(SnapshotStore):
+    """SnapshotStore that persists its derived state across restarts."""
+
+    def __init__(self, path: str = SNAPSHOT_CHECKPOINT, checkpoint_seconds: float = CHECKPOINT_SECONDS, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.checkpoint_seconds = checkpoint_seconds
+        self._written: Optional[Tuple[int, int]] = None  # (snapshot version, cache version) on disk
+        self._task: Optional[asyncio.Task] = None
+
+    def _state_version(self) -> Tuple[int, int]:
+        snapshot_version = self._snapshot.version if self._snapshot is not None else 0
+        cache_version = self.summary_cache.version if self.summary_cache is not None else 0
+        return snapshot_version, cache_version
+
+    def restore(self) -> bool:
+        """Map the checkpoint back in; returns False when starting cold."""
+        if not os.path.exists(self.path):
+            return False
+        started = time.perf_counter()
+        try:
+            snapshot, state = load_checkpoint(self.path)
+        except (OSError, ValueError, KeyError, SnapshotFormatError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}, state will be rebuilt: {str(e)}")
+            return False
+        self.restore_state(snapshot, state)
+        self._written = self._state_version()
+        logger.info(
+            f"Restored snapshot v{snapshot.version} ({len(snapshot.articles)} articles, "
+            f"{len(state.get('summaries', []))} cached summaries) in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return True
+
+    def checkpoint(self) -> bool:
+        """Write the checkpoint if anything changed since the last write."""
+        snapshot = self._snapshot
+        version = self._state_version()
+        if snapshot is None or version == self._written:
+            return False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_snapshot_file(self.path, snapshot, self.checkpoint_state())
+        self._written = version
+        logger.info(f"Checkpointed snapshot v{snapshot.version} to {self.path}")
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_seconds)
+            try:
+                await run_in_threadpool(self.checkpoint)
+            except OSError as e:
+                logger.error(f"Failed to write checkpoint: {str(e)}")
+
+    async def start(self):
+        await run_in_threadpool(self.restore)
+        await super().start()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await run_in_threadpool(self.checkpoint)
+        except OSError as e:
+            logger.error(f"Failed to write checkpoint: {str(e)}")
+        await super().stop()
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, ForeignKey, LargeBinary, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -32,6 +32,84 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    preference = relationship("UserPreference", uselist=False, cascade="all, delete-orphan")
+    interactions = relationship("ArticleInteraction", cascade="all, delete-orphan")
+
+class UserPreference(Base):
+    __tablename__ = "user_preferences"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    categories = Column(String, nullable=False, default="")  # comma-separated
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ArticleInteraction(Base):
+    __tablename__ = "article_interactions"
+    __table_args__ = (Index("ix_article_interactions_user_created", "user_id", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    article_id = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="click")  # click or read
+    embedding = Column(LargeBinary, nullable=True)  # float32 article embedding
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ArchivedArticle(Base):
+    __tablename__ = "articles"
+    __table_args__ = (
+        Index("ix_articles_published", "published_at", "id"),
+        Index("ix_articles_category_published", "category", "published_at", "id"),
+        Index("ix_articles_source_published", "source", "published_at", "id"),
+    )
+
+    id = Column(String, primary_key=True)  # same stable id as the live feed
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=False)
+    url = Column(String, nullable=False)
+    source = Column(String, nullable=False)
+    category = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)
+    published_raw = Column(String, nullable=False, default="")  # as sent by the feed
+    published_at = Column(DateTime, nullable=False)  # parsed, naive UTC
+    ingested_at = Column(DateTime, default=datetime.utcnow)
+
+class SummaryJob(Base):
+    __tablename__ = "summary_jobs"
+    __table_args__ = (Index("ix_summary_jobs_owner_status", "owner", "status"),)
+
+    id = Column(String, primary_key=True)  # uuid4
+    owner = Column(String, nullable=False)  # client key of the submitter
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, cancelled
+    priority = Column(Integer, nullable=False, default=1)  # lower runs first
+    total = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    items = relationship("SummaryJobItem", cascade="all, delete-orphan", order_by="SummaryJobItem.position")
+
+class SummaryJobItem(Base):
+    __tablename__ = "summary_job_items"
+    __table_args__ = (
+        Index("ix_summary_job_items_job_position", "job_id", "position", unique=True),
+        Index("ix_summary_job_items_queue", "status", "priority", "id"),
+        Index("ix_summary_job_items_hash", "text_hash", "status"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String, ForeignKey("summary_jobs.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    priority = Column(Integer, nullable=False, default=1)  # copied from the job for the queue index
+    text = Column(Text, nullable=False)
+    text_hash = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed, cancelled
+    summary = Column(Text, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_by = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
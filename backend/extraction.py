@@ -0,0 +1,221 @@
+"""
+Optional full-article content extraction.
+
+RSS descriptions are one-line teasers. When EXTRACT_FULL_TEXT is enabled,
+ingestion fetches the linked pages of new or changed articles with a bounded
+number of concurrent requests. It extracts the main body text in a process
+pool, so HTML parsing never runs on the server's event loop or ingestion
+thread. Extracted text is cached on disk per URL together with the page's
+ETag/Last-Modified. Later fetches are conditional requests, and a 304 reuses
+the cached text without re-parsing.
+"""
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from articles import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_FULL_TEXT = os.getenv("EXTRACT_FULL_TEXT", "false").lower() == "true"
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "8"))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "10"))
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "cache/articles")
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+MIN_PARAGRAPH_CHARS = 25
+USER_AGENT = "KuraKaniNewsBot/1.0"
+
+class _MainTextParser(HTMLParser):
+    """Collects paragraphs with the chain of containers they sit in."""
+    SKIP = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "figure", "svg", "button"}
+    CONTAINERS = {"body", "main", "article", "section", "div", "td"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: List[Tuple[Tuple[int, ...], str]] = []
+        self.container_tags: Dict[int, str] = {}
+        self._stack: List[Tuple[int, str]] = []
+        self._skip_depth = 0
+        self._buffer: Optional[List[str]] = None
+
+    def _flush(self):
+        if self._buffer is not None:
+            text = " ".join("".join(self._buffer).split())
+            if text:
+                self.paragraphs.append((tuple(cid for cid, _ in self._stack), text))
+        self._buffer = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif self._skip_depth:
+            return
+        elif tag == "p":
+            self._flush()
+            self._buffer = []
+        elif tag in self.CONTAINERS:
+            self._flush()
+            cid = len(self.container_tags)
+            self.container_tags[cid] = tag
+            self._stack.append((cid, tag))
+        elif tag == "br" and self._buffer is not None:
+            self._buffer.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif self._skip_depth:
+            return
+        elif tag == "p":
+            self._flush()
+        elif tag in self.CONTAINERS:
+            self._flush()
+            # Tolerate unclosed tags: pop back to the matching container
+            for i in range(len(self._stack) - 1, -1, -1):
+                if self._stack[i][1] == tag:
+                    del self._stack[i:]
+                    break
+
+    def handle_data(self, data):
+        if self._buffer is not None and not self._skip_depth:
+            self._buffer.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def extract_main_text(html: str) -> str:
+    """Return the main body text of an HTML page, paragraphs separated by blank lines."""
+    parser = _MainTextParser()
+    parser.feed(html)
+    parser.close()
+
+    # Score each container by the paragraph text inside it, favouring the
+    # innermost one, then keep the paragraphs of the best container
+    scores: Dict[int, float] = {}
+    for chain, text in parser.paragraphs:
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        for depth, cid in enumerate(reversed(chain[-3:])):
+            scores[cid] = scores.get(cid, 0.0) + len(text) / (depth + 1)
+    if not scores:
+        return ""
+    for cid in scores:
+        if parser.container_tags[cid] in ("article", "main"):
+            scores[cid] *= 1.5
+    best = max(scores, key=scores.get)
+    return "\n\n".join(
+        text for chain, text in parser.paragraphs
+        if best in chain and len(text) >= MIN_PARAGRAPH_CHARS
+    )
+
+class ExtractionCache:
+    """Extracted text on disk, one JSON file per URL."""
+
+    def __init__(self, directory: str = EXTRACT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url), "rb") as f:
+                return loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], text: str):
+        path = self._path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(dumps({"url": url, "etag": etag, "last_modified": last_modified, "text": text}))
+        os.replace(tmp_path, path)
+
+class ContentExtractor:
+    """Fetches article pages concurrently and extracts their body text."""
+
+    def __init__(
+        self,
+        cache: Optional[ExtractionCache] = None,
+        concurrency: int = EXTRACT_CONCURRENCY,
+        timeout: float = EXTRACT_TIMEOUT,
+        workers: int = EXTRACT_WORKERS
+    ):
+        self.cache = cache or ExtractionCache()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.stats = {"fetched": 0, "not_modified": 0, "failed": 0}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Never fork this process: it has model weights and running threads
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    async def _extract_one(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str) -> Optional[str]:
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            async with semaphore:
+                async with client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304 and cached:
+                        self.stats["not_modified"] += 1
+                        return cached["text"]
+                    response.raise_for_status()
+                    # Stop reading at the cap instead of downloading the whole page
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) >= MAX_PAGE_BYTES:
+                            break
+            html = bytes(body[:MAX_PAGE_BYTES]).decode(response.encoding or "utf-8", errors="replace")
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(self._executor(), extract_main_text, html)
+            self.cache.put(url, response.headers.get("etag"), response.headers.get("last-modified"), text)
+            self.stats["fetched"] += 1
+            return text
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"Could not extract {url}: {str(e)}")
+            return cached["text"] if cached else None
+
+    async def extract_all(self, urls: List[str]) -> Dict[str, str]:
+        """Extract body text for each URL; URLs that fail are left out."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(
+            timeout=self.timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT}
+        ) as client:
+            texts = await asyncio.gather(*(self._extract_one(client, semaphore, url) for url in urls))
+        return {url: text for url, text in zip(urls, texts) if text}
+
+    def extract_all_sync(self, urls: List[str]) -> Dict[str, str]:
+        """Run extract_all from a thread without an event loop (the ingestion thread)."""
+        if not urls:
+            return {}
+        return asyncio.run(self.extract_all(urls))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,480 @@
+"""
+Shared model-inference server for all API workers.
+
+Each worker process normally loads BART-large and MiniLM itself. N uvicorn
+workers therefore hold N copies of the weights and compete for the same
+cores without coordination. When INFERENCE_SOCKET is set, the models are
+loaded once, by a separate process (`python inference.py`), and workers
+reach it over a Unix socket:
+
+- RemoteSummarizer and RemoteEmbedder stand in for the transformers pipeline
+  and the SentenceTransformer. LengthAwareSummarizer, ingestion and the
+  categorizer use them unchanged. Tokenizing for chunk planning stays in the
+  worker; only model calls cross the socket.
+- Requests that arrive from any worker within INFERENCE_BATCH_WAIT_MS are
+  merged into shared batches. Embeddings become one encode call. Summaries
+  are regrouped by token length under the summarizer's token budget.
+- `python inference.py health` is the readiness probe. It exits 0 once the
+  models are loaded.
+- The server restarts independently of the API. Clients reconnect on their
+  own. Calls made while the server is down or still loading raise
+  InferenceUnavailable.
+
+Each frame is a "<II" prefix (header length, payload length), then an orjson
+header, then a raw payload. The payload carries embeddings as float32 bytes.
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, List, Optional, Tuple, Union
+
+import numpy as np
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv("config.env")
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")  # unset: every worker loads its own models
+INFERENCE_BATCH_WAIT_MS = float(os.getenv("INFERENCE_BATCH_WAIT_MS", "5"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))  # texts merged into one model call
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "300"))
+INFERENCE_READY_TIMEOUT = float(os.getenv("INFERENCE_READY_TIMEOUT", "60"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "facebook/bart-large-cnn")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+DEFAULT_SOCKET = "inference.sock"
+FRAME = struct.Struct("<II")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+SUMMARY_OPTIONS = ("max_length", "min_length", "do_sample", "truncation")
+DRAIN_SECONDS = 30
+
+class InferenceError(RuntimeError):
+    """The server ran the request and the model failed."""
+
+class InferenceUnavailable(ConnectionError):
+    """The server is not running, still loading, or went away."""
+
+def encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    head = orjson.dumps(header)
+    return FRAME.pack(len(head), len(payload)) + head + payload
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("inference server closed the connection")
+        received += count
+    return buffer
+
+# Server
+
+class _Pending:
+    __slots__ = ("texts", "options", "future")
+
+    def __init__(self, texts: List[str], options: dict, future: asyncio.Future):
+        self.texts = texts
+        self.options = options
+        self.future = future
+
+class _Batcher:
+    """Merges requests for one model from every connection into shared batches."""
+
+    def __init__(self, name: str, run: Callable, max_batch: int, wait_ms: float):
+        self.name = name
+        self.run = run  # (texts, options) -> sequence with one output per text
+        self.max_batch = max_batch
+        self.wait_ms = wait_ms
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._queue: Deque[_Pending] = deque()
+        self._ready = asyncio.Event()
+        self._busy = False
+        # One thread per model: calls on the same model never overlap
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix=f"inference-{name}")
+
+    @property
+    def idle(self) -> bool:
+        return not self._queue and not self._busy
+
+    def submit(self, texts: List[str], options: dict) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(_Pending(texts, options, future))
+        self.requests += 1
+        self._ready.set()
+        return future
+
+    def _take(self) -> List[_Pending]:
+        """The oldest request plus later ones with the same options, up to max_batch texts."""
+        first = self._queue.popleft()
+        batch, size, rest = [first], len(first.texts), deque()
+        while self._queue:
+            pending = self._queue.popleft()
+            if pending.options == first.options and size + len(pending.texts) <= self.max_batch:
+                batch.append(pending)
+                size += len(pending.texts)
+            else:
+                rest.append(pending)
+        self._queue = rest
+        return batch
+
+    async def _execute(self, batch: List[_Pending]):
+        loop = asyncio.get_running_loop()
+        texts = [text for pending in batch for text in pending.texts]
+        try:
+            outputs = await loop.run_in_executor(self._executor, self.run, texts, batch[0].options)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0].future.done():
+                    batch[0].future.set_exception(e)
+                return
+            # Rerun one by one so a bad request only fails itself
+            for pending in batch:
+                await self._execute([pending])
+            return
+        self.batches += 1
+        self.texts += len(texts)
+        position = 0
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(outputs[position:position + len(pending.texts)])
+            position += len(pending.texts)
+
+    async def run_forever(self):
+        while True:
+            await self._ready.wait()
+            if sum(len(pending.texts) for pending in self._queue) < self.max_batch and self.wait_ms > 0:
+                # Give requests from other workers a moment to join this batch
+                await asyncio.sleep(self.wait_ms / 1000)
+            batch = self._take()
+            if not self._queue:
+                self._ready.clear()
+            self._busy = True
+            try:
+                await self._execute(batch)
+            finally:
+                self._busy = False
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(pending.texts) for pending in self._queue),
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "meanBatch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+class InferenceServer:
+    """Hosts the summarizer and embedder for every worker behind one socket."""
+
+    def __init__(
+        self,
+        path: str = INFERENCE_SOCKET or DEFAULT_SOCKET,
+        max_batch: int = INFERENCE_MAX_BATCH,
+        batch_wait_ms: float = INFERENCE_BATCH_WAIT_MS
+    ):
+        self.path = path
+        self.max_batch = max_batch
+        self.batch_wait_ms = batch_wait_ms
+        self.status = "loading"  # loading, ready, failed or stopping
+        self.summarizer = None
+        self.planner = None
+        self.embedder = None
+        self._started = time.time()
+        self._summaries: Optional[_Batcher] = None
+        self._embeddings: Optional[_Batcher] = None
+        self._connections = {}  # writer -> handler task
+
+    def load_models(self):
+        from sentence_transformers import SentenceTransformer
+        from transformers import pipeline
+
+        from summarization import LengthAwareSummarizer
+
+        started = time.perf_counter()
+        self.summarizer = pipeline("summarization", model=SUMMARY_MODEL)
+        self.planner = LengthAwareSummarizer(self.summarizer)
+        self.embedder = SentenceTransformer(EMBEDDING_MODEL)
+        logger.info(f"Loaded {SUMMARY_MODEL} and {EMBEDDING_MODEL} in {time.perf_counter() - started:.1f} s")
+
+    def summarize(self, texts: List[str], options: dict) -> List[str]:
+        """Summarize texts merged from several requests, in similar-length batches."""
+        lengths = [len(ids) for ids in self.planner.tokenizer(texts, truncation=True)["input_ids"]]
+        summaries: List[Optional[str]] = [None] * len(texts)
+        for batch in self.planner.plan_batches(lengths):
+            outputs = self.summarizer([texts[i] for i in batch], batch_size=len(batch), **options)
+            for index, output in zip(batch, outputs):
+                summaries[index] = output["summary_text"]
+        return summaries
+
+    def embed(self, texts: List[str], options: dict) -> np.ndarray:
+        vectors = self.embedder.encode(
+            texts,
+            batch_size=self.max_batch,
+            convert_to_numpy=True,
+            normalize_embeddings=options["normalize"]
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def health(self) -> dict:
+        return {
+            "status": self.status,
+            "pid": os.getpid(),
+            "uptimeSeconds": round(time.time() - self._started, 1),
+            "models": {"summarizer": SUMMARY_MODEL, "embedder": EMBEDDING_MODEL},
+            "connections": len(self._connections),
+            "summarize": self._summaries.stats() if self._summaries else None,
+            "embed": self._embeddings.stats() if self._embeddings else None,
+        }
+
+    async def _respond(self, header: dict) -> bytes:
+        op = header.get("op")
+        if op == "health":
+            return encode_frame(self.health())
+        if self.status != "ready":
+            return encode_frame({"error": f"inference server is {self.status}", "unavailable": True})
+        texts = header.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return encode_frame({"error": "texts must be a list of strings"})
+        if op == "summarize":
+            batcher = self._summaries
+            options = {key: header[key] for key in SUMMARY_OPTIONS if key in header}
+        elif op == "embed":
+            batcher = self._embeddings
+            options = {"normalize": bool(header.get("normalize"))}
+        else:
+            return encode_frame({"error": f"unknown operation {op!r}"})
+        if not texts:
+            result = np.zeros((0, 0), dtype=np.float32) if op == "embed" else []
+        else:
+            try:
+                result = await batcher.submit(texts, options)
+            except Exception as e:
+                return encode_frame({"error": str(e)})
+        if op == "embed":
+            return encode_frame({"shape": list(result.shape)}, result.tobytes())
+        return encode_frame({"summaries": list(result)})
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                header_length, payload_length = FRAME.unpack(await reader.readexactly(FRAME.size))
+                if header_length + payload_length > MAX_FRAME_BYTES:
+                    logger.warning("Closing inference connection after an oversized frame")
+                    break
+                header = orjson.loads(await reader.readexactly(header_length))
+                if payload_length:
+                    await reader.readexactly(payload_length)  # requests carry no payload
+                writer.write(await self._respond(header))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, orjson.JSONDecodeError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    def _prepare_socket(self):
+        if not os.path.exists(self.path):
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)  # left behind by a server that died
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another inference server is already listening on {self.path}")
+
+    async def serve(self) -> int:
+        """Serve until SIGTERM/SIGINT; returns the process exit code."""
+        loop = asyncio.get_running_loop()
+        self._prepare_socket()
+        self._summaries = _Batcher("summarize", self.summarize, self.max_batch, self.batch_wait_ms)
+        self._embeddings = _Batcher("embed", self.embed, self.max_batch, self.batch_wait_ms)
+        tasks = [asyncio.create_task(batcher.run_forever()) for batcher in (self._summaries, self._embeddings)]
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        os.chmod(self.path, 0o660)
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        logger.info(f"Inference server listening on {self.path}, loading models")
+
+        def loaded(future: asyncio.Future):
+            if future.exception() is None:
+                self.status = "ready"
+                logger.info("Inference server ready")
+            else:
+                self.status = "failed"
+                logger.error(f"Failed to load models: {future.exception()}")
+                stop.set()
+
+        # Health answers "loading" while the weights are read
+        loop.run_in_executor(None, self.load_models).add_done_callback(loaded)
+        await stop.wait()
+
+        failed = self.status == "failed"
+        self.status = "stopping"
+        logger.info("Stopping inference server, finishing queued batches")
+        server.close()
+        deadline = time.monotonic() + DRAIN_SECONDS
+        while not (self._summaries.idle and self._embeddings.idle) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.05)  # let handlers write the last responses
+        for task in tasks:
+            task.cancel()
+        handlers = list(self._connections.values())
+        for writer in list(self._connections):
+            writer.close()
+        if handlers:
+            await asyncio.wait(handlers, timeout=1)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        return 1 if failed else 0
+
+# Client
+
+class InferenceClient:
+    """Blocking client for the inference server; each thread keeps its own connection."""
+
+    def __init__(self, path: str = INFERENCE_SOCKET or DEFAULT_SOCKET, timeout: float = INFERENCE_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, frame: bytes) -> Tuple[dict, bytearray]:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        sock.sendall(frame)
+        header_length, payload_length = FRAME.unpack(_recv_exact(sock, FRAME.size))
+        header = orjson.loads(_recv_exact(sock, header_length))
+        return header, _recv_exact(sock, payload_length) if payload_length else bytearray()
+
+    def request(self, header: dict) -> Tuple[dict, bytearray]:
+        frame = encode_frame(header)
+        for attempt in range(2):
+            try:
+                response, payload = self._roundtrip(frame)
+                break
+            except socket.timeout as e:
+                self._close()
+                raise InferenceUnavailable(f"Inference server did not answer within {self.timeout:.0f} s") from e
+            except OSError as e:
+                # A connection from before a server restart fails once; reconnect and retry
+                self._close()
+                if attempt:
+                    raise InferenceUnavailable(f"Inference server at {self.path} is unreachable: {e}") from e
+        if "error" in response:
+            error = InferenceUnavailable if response.get("unavailable") else InferenceError
+            raise error(response["error"])
+        return response, payload
+
+    def health(self) -> dict:
+        try:
+            return self.request({"op": "health"})[0]
+        except InferenceUnavailable as e:
+            return {"status": "unreachable", "error": str(e)}
+
+    def wait_ready(self, timeout: float = INFERENCE_READY_TIMEOUT) -> bool:
+        """Poll until the server has loaded its models; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.health()["status"] == "ready":
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+
+    async def wait_ready_async(self, timeout: float = INFERENCE_READY_TIMEOUT) -> bool:
+        """wait_ready for the event loop: health checks run in a thread, and cancelling stops at once."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while True:
+            health = await loop.run_in_executor(None, self.health)
+            if health["status"] == "ready":
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.5)
+
+    def summarize(self, texts: List[str], **options) -> List[str]:
+        header = {"op": "summarize", "texts": texts}
+        header.update((key, value) for key, value in options.items() if key in SUMMARY_OPTIONS)
+        return self.request(header)[0]["summaries"]
+
+    def embed(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        response, payload = self.request({"op": "embed", "texts": texts, "normalize": normalize})
+        return np.frombuffer(payload, dtype=np.float32).reshape(response["shape"])
+
+class RemoteSummarizer:
+    """Drop-in for the transformers summarization pipeline, run by the inference server."""
+
+    def __init__(self, client: InferenceClient, model: str = SUMMARY_MODEL):
+        from transformers import AutoTokenizer
+
+        self.client = client
+        # Only the tokenizer is loaded here, for chunk planning
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: Optional[int] = None, **options) -> List[dict]:
+        # batch_size is ignored: the server regroups texts from every worker
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        return [{"summary_text": summary} for summary in self.client.summarize(texts, **options)]
+
+class RemoteEmbedder:
+    """Drop-in for SentenceTransformer.encode, run by the inference server."""
+
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def encode(self, sentences: Union[str, List[str]], normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.client.embed([sentences], normalize_embeddings)[0]
+        return self.client.embed(list(sentences), normalize_embeddings)
+
+def main(argv: List[str]) -> int:
+    """`python inference.py` serves; `python inference.py health` probes readiness."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    path = INFERENCE_SOCKET or DEFAULT_SOCKET
+    if argv[1:2] == ["health"]:
+        health = InferenceClient(path, timeout=5).health()
+        print(orjson.dumps(health, option=orjson.OPT_INDENT_2).decode())
+        return 0 if health["status"] == "ready" else 1
+    try:
+        return asyncio.run(InferenceServer(path).serve())
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
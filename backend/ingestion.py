@@ -0,0 +1,508 @@
+"""
+Feed ingestion and the shared in-memory article snapshot.
+
+The RSS feed is fetched at most once per refresh interval. Each fetch produces
+an immutable FeedSnapshot holding the categorized and summarized articles and,
+when the embedding model is available, a normalized embedding matrix with one
+row per article. Request handlers read the current snapshot instead of
+re-fetching.
+
+Ingestion is incremental: entries are keyed by GUID (falling back to the link)
+and compared to the previous snapshot by content hash. Unchanged entries reuse
+their Article object, summary and embedding row; only new or changed entries
+are categorized, summarized and embedded. Articles whose summary could not be
+made because the model backend was unreachable keep summary None and are
+summarized again on the next cycle. Likewise, rows that could not be embedded
+are left as zero vectors while every reused row is kept, and the zero rows
+are embedded again on the next cycle.
+
+A stale snapshot keeps being served while its replacement is built in a
+background task; only the very first request waits. With a scheduler,
+ingestion summaries take model slots at bulk priority like any other caller.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import feedparser
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from admission import PRIORITY_BULK
+from articles import Article
+from search import SearchIndex
+from summarization import LengthAwareSummarizer, SummaryCache
+
+logger = logging.getLogger(__name__)
+
+FEED_URL = "https://feeds.bbci.co.uk/news/rss.xml"
+FEED_REFRESH_SECONDS = int(os.getenv("FEED_REFRESH_SECONDS", "300"))
+MAX_ARTICLES = 100
+SCHEDULER_KEY = "ingestion"
+
+def categorize_article(text: str) -> Optional[str]:
+    text = text.lower()
+    categories = {
+        "entertainment": [
+            "movie", "film", "music", "concert", "festival", "actor", "actress", "tv", 
+            "television", "show", "celebrity", "premiere", "award", "drama", "comedy", 
+            "entertainment", "cinema", "theatre", "album", "streaming", "hollywood", 
+            "musical", "band", "performance", "red carpet", "oscars", "grammy", 
+            "netflix", "series", "director", "screenplay"
+        ],
+        "sports": [
+            "sport", "football", "cricket", "tennis", "athlete", "game", "match", 
+            "tournament", "olympics", "soccer", "basketball", "rugby", "championship", 
+            "team", "player", "coach", "league", "score", "stadium", "training"
+        ],
+        "crime": [
+            "murder", "theft", "assault", "robbery", "fraud", "arrest", "police", "crime", 
+            "homicide", "burglary", "court", "trial", "investigation", "suspect", "criminal", 
+            "law enforcement", "offence", "felony", "misdemeanor", "scandal", "corruption", 
+            "gang", "violence", "prosecution", "detective", "evidence", "jail"
+        ],
+        "politics": [
+            "election", "government", "policy", "minister", "parliament", "vote", 
+            "politician", "law", "brexit", "president", "prime minister", "congress", 
+            "senate", "legislation", "campaign", "debate", "diplomacy", "bill", 
+            "reform", "cabinet"
+        ],
+    }
+    for category, keywords in categories.items():
+        if any(keyword in text for keyword in keywords):
+            logger.info(f"Article categorized as {category}: {text[:100]}...")
+            return category
+    logger.info(f"Article not categorized: {text[:100]}...")
+    return None
+
+NO_DESCRIPTION = "No description available"
+EMBED_CONTENT_CHARS = 2000
+
+def article_id(key: str) -> str:
+    """Derive a stable article id from an entry's GUID or link."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+def content_hash(title: str, description: str, published_at: str) -> str:
+    """Hash the fields an entry's derived data depends on."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (title, description, published_at):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def article_hash(article: Article) -> str:
+    return content_hash(article.title, article.description, article.published_at)
+
+def article_text(article: Article) -> str:
+    """Text used to embed an article."""
+    if article.content:
+        # The embedding model only reads the first few hundred tokens
+        return f"{article.title}. {article.description} {article.content[:EMBED_CONTENT_CHARS]}"
+    return f"{article.title}. {article.description}"
+
+def summary_source(article: Article) -> str:
+    """Text used to summarize an article."""
+    if article.content:
+        return article.content
+    return article.description if article.description != NO_DESCRIPTION else article.title
+
+def categorization_text(article: Article) -> str:
+    """Text for the keyword rules: long bodies match unrelated keywords, so never the full text."""
+    return article.title + " " + article.description
+
+def entry_article(entry) -> Article:
+    """Build an uncategorized, unsummarized article from a feed entry."""
+    return Article(
+        id=article_id(entry.get("id") or entry.link),
+        title=entry.title,
+        description=entry.get("description", NO_DESCRIPTION),
+        url=entry.link,
+        source="BBC",
+        published_at=entry.get("published", "")
+    )
+
+def summarize_texts(
+    summarizer: Optional[LengthAwareSummarizer],
+    texts: List[str],
+    run_batch: Optional[Callable[[List[str]], List[str]]] = None
+) -> List[str]:
+    """Summarize texts in length-aware batches, falling back to truncation without a model.
+
+    ConnectionError (the inference server is down) propagates: the caller retries later.
+    """
+    if summarizer is None:
+        return [text[:100] + "..." if len(text) > 100 else text for text in texts]
+    try:
+        return summarizer.summarize(texts, run_batch=run_batch)
+    except ConnectionError:
+        raise
+    except Exception as e:
+        logger.error(f"Error summarizing batch, retrying one by one: {str(e)}")
+    summaries = []
+    for text in texts:
+        try:
+            summaries.append(summarizer.summarize([text], run_batch=run_batch)[0])
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.error(f"Error summarizing text: {str(e)}")
+            summaries.append("Summary not available")
+    return summaries
+
+def embed_texts(embedder, texts: List[str]) -> Optional[np.ndarray]:
+    """Embed texts into L2-normalized float32 rows, or None without a model."""
+    if embedder is None or not texts:
+        return None
+    vectors = embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+class FeedSnapshot:
+    """One ingested version of the feed."""
+    __slots__ = ("version", "articles", "embeddings", "created_at", "_rows", "_search_index")
+
+    def __init__(
+        self,
+        version: int,
+        articles: List[Article],
+        embeddings: Optional[np.ndarray],
+        created_at: Optional[float] = None,
+        search_index: Optional[SearchIndex] = None
+    ):
+        self.version = version
+        self.articles = articles
+        self.embeddings = embeddings
+        self.created_at = created_at if created_at is not None else time.time()
+        self._rows: Dict[str, int] = {article.id: row for row, article in enumerate(articles)}
+        self._search_index = search_index
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """Trigram index over the articles, built on first use."""
+        if self._search_index is None:
+            self._search_index = SearchIndex.build(self.articles)
+        return self._search_index
+
+    def search(self, query: str) -> List[Article]:
+        return self.search_index.search(self.articles, query)
+
+    def row(self, article_id: str) -> Optional[int]:
+        """Return the position of an article in the snapshot."""
+        return self._rows.get(article_id)
+
+    def embedding(self, article_id: str) -> Optional[np.ndarray]:
+        """Return the embedding of an article, if present."""
+        row = self._rows.get(article_id)
+        if row is None or self.embeddings is None or not self.embeddings[row].any():
+            return None  # zero rows failed to embed and await a retry
+        return self.embeddings[row]
+
+class IngestStats:
+    """Counters describing the work done by one ingestion cycle."""
+    __slots__ = (
+        "version", "fetched", "new", "changed", "unchanged", "removed",
+        "extracted", "summarized", "embedded", "not_modified", "duration_ms",
+    )
+
+    def __init__(self, version: int):
+        self.version = version
+        self.fetched = 0
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.extracted = 0
+        self.summarized = 0
+        self.embedded = 0
+        self.not_modified = False
+        self.duration_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class SnapshotStore:
+    """Holds the current snapshot and rebuilds it once it is stale."""
+
+    def __init__(
+        self,
+        embedder=None,
+        summarizer=None,
+        archive: Optional[Callable[[List[Article]], None]] = None,
+        extractor=None,
+        categorizer=None,
+        trending=None,
+        summary_cache: Optional[SummaryCache] = None,
+        scheduler=None,
+        refresh_seconds: int = FEED_REFRESH_SECONDS
+    ):
+        self.embedder = embedder
+        self.summarizer = LengthAwareSummarizer(summarizer, cache=summary_cache) if summarizer is not None else None
+        self.summary_cache = summary_cache
+        self.archive = archive
+        self.extractor = extractor
+        self.categorizer = categorizer
+        self.trending = trending
+        self.scheduler = scheduler  # admission.ModelScheduler shared with the API
+        self.refresh_seconds = refresh_seconds
+        self.last_stats: Optional[IngestStats] = None
+        self._snapshot: Optional[FeedSnapshot] = None
+        self._version = 0
+        self._etag = None
+        self._modified = None
+        self._lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def current(self) -> Optional[FeedSnapshot]:
+        return self._snapshot
+
+    def ingest_stats(self) -> Optional[dict]:
+        """Counters from the most recent ingestion cycle."""
+        return self.last_stats.to_dict() if self.last_stats is not None else None
+
+    def checkpoint_state(self) -> dict:
+        """Derived state besides the snapshot that a checkpoint should keep."""
+        return {
+            "etag": self._etag,
+            "modified": self._modified,
+            "summaries": self.summary_cache.items() if self.summary_cache is not None else [],
+        }
+
+    def restore_state(self, snapshot: Optional[FeedSnapshot], state: dict):
+        """Adopt a snapshot and state loaded from a checkpoint."""
+        if snapshot is not None:
+            self._snapshot = snapshot
+            self._version = snapshot.version
+            self._etag = state.get("etag")
+            self._modified = state.get("modified")
+        if self.summary_cache is not None:
+            self.summary_cache.load([tuple(entry) for entry in state.get("summaries", [])])
+
+    def trending_terms(self) -> Optional[dict]:
+        """Current trending terms, or None when trending is disabled."""
+        return self.trending.current() if self.trending is not None else None
+
+    async def start(self):
+        """Start the first ingestion in the background."""
+        self._schedule_refresh()
+
+    async def stop(self):
+        """Stop background work and release resources."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self.extractor is not None:
+            self.extractor.close()
+
+    def _is_fresh(self, snapshot: Optional[FeedSnapshot]) -> bool:
+        return snapshot is not None and time.time() - snapshot.created_at < self.refresh_seconds
+
+    async def _build(self, version: int) -> FeedSnapshot:
+        """Run build in a worker thread; model slots are taken through this loop."""
+        self._loop = asyncio.get_running_loop()
+        return await run_in_threadpool(self.build, version)
+
+    async def _refresh(self):
+        async with self._lock:
+            if not self._is_fresh(self._snapshot):
+                self._snapshot = await self._build(self._version + 1)
+                self._version = self._snapshot.version
+
+    async def _refresh_in_background(self):
+        try:
+            await self._refresh()
+        except Exception as e:
+            logger.error(f"Background ingestion failed, serving the previous snapshot: {str(e)}")
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_in_background())
+
+    async def get(self) -> FeedSnapshot:
+        """Return the current snapshot; a stale one is served while it is rebuilt."""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        if snapshot is not None:
+            self._schedule_refresh()
+            return snapshot
+        await self._refresh()  # nothing to serve yet
+        return self._snapshot
+
+    def _run_batch(self, texts: List[str]) -> List[str]:
+        """Summarize one batch inside a bulk model slot (called from the build thread)."""
+        if self.scheduler is None or self._loop is None:
+            return self.summarizer.run_batch(texts)
+        asyncio.run_coroutine_threadsafe(self.scheduler.acquire(SCHEDULER_KEY, PRIORITY_BULK), self._loop).result()
+        try:
+            return self.summarizer.run_batch(texts)
+        finally:
+            self._loop.call_soon_threadsafe(self.scheduler.release)
+
+    def _summarize(self, articles: List[Article]) -> int:
+        """Set article summaries; returns how many were made.
+
+        If the summarizer is unreachable the summaries stay None, and the
+        next cycle picks those articles up again.
+        """
+        if not articles:
+            return 0
+        try:
+            summaries = summarize_texts(self.summarizer, [summary_source(a) for a in articles], self._run_batch)
+        except ConnectionError as e:
+            logger.warning(f"Summarizer unreachable, {len(articles)} articles will be summarized next cycle: {str(e)}")
+            return 0
+        for article, summary in zip(articles, summaries):
+            article.summary = summary
+        return len(articles) if self.summarizer is not None else 0
+
+    def build(self, version: int) -> FeedSnapshot:
+        """Fetch the feed and derive a new snapshot with the given version."""
+        started = time.perf_counter()
+        stats = IngestStats(version)
+        previous = self._snapshot
+        feed = feedparser.parse(FEED_URL, etag=self._etag, modified=self._modified)
+
+        if previous is not None and (feed.get("status") == 304 or (feed.get("bozo") and not feed.entries)):
+            # Feed unchanged (or unreachable): keep every article as is
+            stats.not_modified = True
+            stats.unchanged = stats.fetched = len(previous.articles)
+            pending = [article for article in previous.articles if article.summary is None]
+            stats.summarized = self._summarize(pending)
+            if stats.summarized and self.archive is not None:
+                self.archive(pending)
+            embeddings = previous.embeddings
+            if embeddings is not None and not embeddings.any(axis=1).all():
+                # Retry rows that failed to embed in an earlier cycle
+                rows = range(len(previous.articles))
+                embeddings = self._embed(previous.articles, [], dict(zip(rows, rows)), previous, stats)
+            snapshot = FeedSnapshot(version, previous.articles, embeddings)
+            return self._finish(snapshot, stats, started)
+
+        self._etag = feed.get("etag")
+        self._modified = feed.get("modified")
+        articles: List[Article] = []
+        reused_rows: Dict[int, int] = {}  # new row -> previous embedding row
+        fresh: List[int] = []             # rows needing categorization, summary and embedding
+        seen = set()
+        for entry in feed.entries[:MAX_ARTICLES]:
+            candidate = entry_article(entry)
+            if candidate.id in seen:
+                continue
+            seen.add(candidate.id)
+            stats.fetched += 1
+            old_row = previous.row(candidate.id) if previous is not None else None
+            if old_row is not None:
+                old = previous.articles[old_row]
+                if article_hash(old) == article_hash(candidate):
+                    stats.unchanged += 1
+                    reused_rows[len(articles)] = old_row
+                    articles.append(old)
+                    continue
+                stats.changed += 1
+            else:
+                stats.new += 1
+            fresh.append(len(articles))
+            articles.append(candidate)
+        if previous is not None:
+            stats.removed = len(previous.articles) - stats.unchanged - stats.changed
+
+        new_articles = [articles[row] for row in fresh]
+        if self.extractor is not None and new_articles:
+            texts = self.extractor.extract_all_sync([article.url for article in new_articles])
+            for article in new_articles:
+                article.content = texts.get(article.url)
+            stats.extracted = len(texts)
+
+        embeddings = self._embed(articles, fresh, reused_rows, previous, stats)
+        # Without fresh vectors (embedding failed) the keyword rules categorize
+        self._categorize(new_articles, embeddings[fresh] if embeddings is not None and stats.embedded else None)
+        # Reused articles left unsummarized while the summarizer was unreachable
+        pending = [articles[row] for row in reused_rows if articles[row].summary is None]
+        stats.summarized = self._summarize(new_articles + pending)
+        if self.archive is not None:
+            self.archive(new_articles + (pending if stats.summarized else []))
+        if self.trending is not None:
+            self.trending.observe(new_articles)
+
+        return self._finish(FeedSnapshot(version, articles, embeddings), stats, started)
+
+    def _categorize(self, articles: List[Article], vectors: Optional[np.ndarray]):
+        """Categorize with the embedding categorizer when configured, else keyword rules."""
+        if self.categorizer is not None and vectors is not None and len(articles):
+            try:
+                labels, _ = self.categorizer.categorize_vectors(vectors)
+            except ConnectionError as e:
+                # Prototypes not embedded yet and the embedder is unreachable
+                logger.warning(f"Embedding categorizer unavailable, using keyword rules for this batch: {str(e)}")
+            else:
+                for article, label in zip(articles, labels):
+                    article.category = label
+                return
+        for article in articles:
+            article.category = categorize_article(categorization_text(article))
+
+    def _embed(
+        self,
+        articles: List[Article],
+        fresh: List[int],
+        reused_rows: Dict[int, int],
+        previous: Optional[FeedSnapshot],
+        stats: IngestStats
+    ) -> Optional[np.ndarray]:
+        """Assemble the embedding matrix, embedding only rows that changed.
+
+        Reused rows that are all zeros failed to embed before and are embedded
+        again. If embedding fails, reused rows are kept and the rows that
+        needed embedding are left as zeros for the next cycle.
+        """
+        if self.embedder is None or not articles:
+            return None
+        if previous is None or previous.embeddings is None:
+            fresh = list(range(len(articles)))
+            reused_rows = {}
+        elif reused_rows:
+            missing = ~previous.embeddings.any(axis=1)
+            retry = [row for row, old_row in reused_rows.items() if missing[old_row]]
+            if retry:
+                reused_rows = {row: old_row for row, old_row in reused_rows.items() if not missing[old_row]}
+                fresh = fresh + retry
+        try:
+            vectors = embed_texts(self.embedder, [article_text(articles[row]) for row in fresh])
+        except Exception as e:
+            if previous is None or previous.embeddings is None:
+                logger.error(f"Error embedding articles: {str(e)}")
+                return None
+            logger.error(f"Error embedding {len(fresh)} articles, retrying next cycle: {str(e)}")
+            vectors = None
+        dim = vectors.shape[1] if vectors is not None else previous.embeddings.shape[1]
+        if reused_rows and previous.embeddings.shape[1] != dim:
+            # Embedding model changed; re-embed everything
+            return self._embed(articles, list(range(len(articles))), {}, None, stats)
+        matrix = np.zeros((len(articles), dim), dtype=np.float32)
+        if reused_rows:
+            new_rows = np.fromiter(reused_rows.keys(), dtype=np.intp, count=len(reused_rows))
+            old_rows = np.fromiter(reused_rows.values(), dtype=np.intp, count=len(reused_rows))
+            matrix[new_rows] = previous.embeddings[old_rows]
+        if fresh and vectors is not None:
+            matrix[fresh] = vectors
+            stats.embedded = len(fresh)
+        return matrix
+
+    def _finish(self, snapshot: FeedSnapshot, stats: IngestStats, started: float) -> FeedSnapshot:
+        stats.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.last_stats = stats
+        logger.info(
+            f"Ingested snapshot v{snapshot.version}: {stats.fetched} entries, {stats.new} new, "
+            f"{stats.changed} changed, {stats.unchanged} unchanged, {stats.removed} removed, "
+            f"{stats.embedded} embedded in {stats.duration_ms} ms"
+        )
+        return snapshot
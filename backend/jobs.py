@@ -0,0 +1,441 @@
+"""
+Persistent queue for bulk summarization jobs.
+
+POST /summarize/jobs stores a job and one row per text in the database and
+returns at once. Background workers claim pending texts in priority order,
+summarize them in batches and write each result back as soon as its batch
+finishes, so progress survives restarts and one bad text only fails itself.
+
+- Claims are a conditional UPDATE, so workers in several processes never
+  take the same item. Items whose claim is older than the lease (their
+  worker died) go back to pending.
+- Identical texts are summarized once: a text already being summarized is
+  not claimed again, and a finished summary is written to every pending item
+  with the same text hash, in any job. New jobs reuse earlier summaries.
+- Cancelling a job drops its pending and running items; results that arrive
+  for them later are discarded.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import Row, and_, case, exists, func, or_, select, update
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, SummaryJob, SummaryJobItem
+
+load_dotenv("config.env")
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", "1"))
+JOB_BATCH_SIZE = int(os.getenv("SUMMARY_JOB_BATCH", "8"))
+JOB_MAX_TEXTS = int(os.getenv("SUMMARY_JOB_MAX_TEXTS", "1000"))
+JOB_MAX_ACTIVE = int(os.getenv("SUMMARY_JOB_MAX_ACTIVE", "5"))  # unfinished jobs per client
+JOB_POLL_SECONDS = float(os.getenv("SUMMARY_JOB_POLL_SECONDS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("SUMMARY_JOB_LEASE_SECONDS", "600"))
+JOB_RETENTION_DAYS = int(os.getenv("SUMMARY_JOB_RETENTION_DAYS", "7"))
+JOB_MAX_ATTEMPTS = 3
+LOOKUP_CHUNK = 500  # stay under SQLite's bound-parameter limit
+MAINTENANCE_SECONDS = 60
+
+JOB_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+ACTIVE_STATUSES = ("queued", "running")
+
+def text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def _chunks(values: List, size: int = LOOKUP_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _finish_jobs(db, now: datetime):
+    """Mark active jobs with no pending or running items as completed."""
+    open_items = exists().where(
+        SummaryJobItem.job_id == SummaryJob.id,
+        SummaryJobItem.status.in_(("pending", "running"))
+    )
+    db.execute(
+        update(SummaryJob)
+        .where(SummaryJob.status.in_(ACTIVE_STATUSES), ~open_items)
+        .values(status="completed", finished_at=now, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+def job_view(job: SummaryJob, counts: Dict[str, int], items: Optional[List[SummaryJobItem]] = None) -> dict:
+    """API representation of a job and, optionally, a page of its results."""
+    names = {value: name for name, value in JOB_PRIORITIES.items()}
+    view = {
+        "id": job.id,
+        "status": job.status,
+        "priority": names.get(job.priority, str(job.priority)),
+        "total": job.total,
+        "completed": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+        "pending": counts.get("pending", 0) + counts.get("running", 0),
+        "cancelled": counts.get("cancelled", 0),
+        "createdAt": job.created_at.isoformat() if job.created_at else None,
+        "updatedAt": job.updated_at.isoformat() if job.updated_at else None,
+        "finishedAt": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if items is not None:
+        view["results"] = [
+            {"index": item.position, "status": item.status, "summary": item.summary, "error": item.error}
+            for item in items
+        ]
+    return view
+
+class SummaryJobQueue:
+    """Database-backed job queue with a pool of asyncio workers."""
+
+    def __init__(
+        self,
+        summarize: Callable[[List[str]], Awaitable[List[str]]],
+        workers: int = JOB_WORKERS,
+        batch_size: int = JOB_BATCH_SIZE,
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        poll_seconds: float = JOB_POLL_SECONDS
+    ):
+        self.summarize = summarize
+        self.workers = workers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_maintenance = 0.0
+        self._claims: Set[str] = set()
+
+    # Database operations (blocking; workers run them in the threadpool)
+
+    def submit(self, owner: str, texts: List[str], priority: int) -> dict:
+        """Store a new job, filling in texts that were summarized before."""
+        now = datetime.utcnow()
+        hashes = [text_hash(text) for text in texts]
+        db = SessionLocal()
+        try:
+            known: Dict[str, str] = {}
+            for chunk in _chunks(sorted(set(hashes))):
+                rows = db.execute(
+                    select(SummaryJobItem.text_hash, SummaryJobItem.summary)
+                    .where(SummaryJobItem.text_hash.in_(chunk), SummaryJobItem.status == "done")
+                ).all()
+                known.update({row.text_hash: row.summary for row in rows})
+
+            job = SummaryJob(
+                id=str(uuid.uuid4()),
+                owner=owner,
+                priority=priority,
+                total=len(texts),
+                created_at=now,
+                updated_at=now,
+            )
+            for position, (text, digest) in enumerate(zip(texts, hashes)):
+                summary = known.get(digest)
+                job.items.append(SummaryJobItem(
+                    position=position,
+                    priority=priority,
+                    text=text,
+                    text_hash=digest,
+                    status="done" if summary is not None else "pending",
+                    summary=summary,
+                ))
+            if all(item.status == "done" for item in job.items):
+                job.status = "completed"
+                job.finished_at = now
+            db.add(job)
+            db.commit()
+            done = sum(digest in known for digest in hashes)
+            logger.info(f"Summary job {job.id}: {len(texts)} texts, {done} already summarized")
+            return job_view(job, {"done": done, "pending": len(texts) - done})
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def active_jobs(self, owner: str) -> int:
+        db = SessionLocal()
+        try:
+            return db.execute(
+                select(func.count()).select_from(SummaryJob)
+                .where(SummaryJob.owner == owner, SummaryJob.status.in_(ACTIVE_STATUSES))
+            ).scalar_one()
+        finally:
+            db.close()
+
+    def _counts(self, db, job_id: str) -> Dict[str, int]:
+        rows = db.execute(
+            select(SummaryJobItem.status, func.count())
+            .where(SummaryJobItem.job_id == job_id)
+            .group_by(SummaryJobItem.status)
+        ).all()
+        return {row[0]: row[1] for row in rows}
+
+    def get(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[SummaryJob, dict]]:
+        """Return the job and its view with results from offset, or None."""
+        db = SessionLocal()
+        try:
+            job = db.get(SummaryJob, job_id)
+            if job is None:
+                return None
+            query = (
+                select(SummaryJobItem)
+                .where(SummaryJobItem.job_id == job_id, SummaryJobItem.position >= offset)
+                .order_by(SummaryJobItem.position)
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            items = db.execute(query).scalars().all()
+            return job, job_view(job, self._counts(db, job_id), items)
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel an unfinished job; finished results are kept."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            job = db.get(SummaryJob, job_id)
+            if job is None:
+                return None
+            if job.status in ACTIVE_STATUSES:
+                db.execute(
+                    update(SummaryJobItem)
+                    .where(SummaryJobItem.job_id == job_id, SummaryJobItem.status.in_(("pending", "running")))
+                    .values(status="cancelled", claimed_by=None)
+                    .execution_options(synchronize_session=False)
+                )
+                job.status = "cancelled"
+                job.finished_at = now
+                job.updated_at = now
+                db.commit()
+                logger.info(f"Summary job {job_id} cancelled")
+            return job_view(job, self._counts(db, job_id))
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def claim(self, token: str, limit: int) -> List[Row]:
+        """Atomically take up to limit pending items, highest priority first."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            in_flight = select(SummaryJobItem.text_hash).where(SummaryJobItem.status == "running")
+            candidates = db.execute(
+                select(SummaryJobItem.id)
+                .where(SummaryJobItem.status == "pending", SummaryJobItem.text_hash.not_in(in_flight))
+                .order_by(SummaryJobItem.priority, SummaryJobItem.id)
+                .limit(limit)
+            ).scalars().all()
+            if not candidates:
+                return []
+            # Re-checking the status makes the claim safe against other workers
+            db.execute(
+                update(SummaryJobItem)
+                .where(SummaryJobItem.id.in_(candidates), SummaryJobItem.status == "pending")
+                .values(status="running", claimed_by=token, claimed_at=now, attempts=SummaryJobItem.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            items = db.execute(
+                select(SummaryJobItem.id, SummaryJobItem.job_id, SummaryJobItem.text, SummaryJobItem.text_hash)
+                .where(SummaryJobItem.claimed_by == token, SummaryJobItem.status == "running")
+            ).all()
+            if items:
+                db.execute(
+                    update(SummaryJob)
+                    .where(SummaryJob.id.in_({item.job_id for item in items}), SummaryJob.status == "queued")
+                    .values(status="running", updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            return items
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def record(self, token: str, results: Dict[str, str], errors: Dict[str, str]):
+        """Checkpoint one batch: store summaries and failures by text hash."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            for digest, summary in results.items():
+                # Also fills pending duplicates in other jobs
+                db.execute(
+                    update(SummaryJobItem)
+                    .where(
+                        SummaryJobItem.text_hash == digest,
+                        or_(
+                            SummaryJobItem.status == "pending",
+                            and_(SummaryJobItem.status == "running", SummaryJobItem.claimed_by == token)
+                        )
+                    )
+                    .values(status="done", summary=summary, error=None, claimed_by=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for digest, error in errors.items():
+                db.execute(
+                    update(SummaryJobItem)
+                    .where(
+                        SummaryJobItem.text_hash == digest,
+                        SummaryJobItem.status == "running",
+                        SummaryJobItem.claimed_by == token
+                    )
+                    .values(
+                        status=case((SummaryJobItem.attempts >= JOB_MAX_ATTEMPTS, "failed"), else_="pending"),
+                        error=error[:500],
+                        claimed_by=None
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            _finish_jobs(db, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def release(self, tokens: List[str]):
+        """Return claimed items to the queue (on shutdown, or when the model is unreachable)."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SummaryJobItem)
+                .where(SummaryJobItem.status == "running", SummaryJobItem.claimed_by.in_(tokens))
+                .values(status="pending", claimed_by=None, attempts=SummaryJobItem.attempts - 1)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def maintain(self, retention_days: int = JOB_RETENTION_DAYS) -> int:
+        """Requeue items with expired claims and delete old finished jobs."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            requeued = db.execute(
+                update(SummaryJobItem)
+                .where(
+                    SummaryJobItem.status == "running",
+                    SummaryJobItem.claimed_at < now - timedelta(seconds=self.lease_seconds)
+                )
+                .values(status=case((SummaryJobItem.attempts >= JOB_MAX_ATTEMPTS, "failed"), else_="pending"),
+                        claimed_by=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            _finish_jobs(db, now)
+            expired = db.execute(
+                select(SummaryJob.id).where(
+                    SummaryJob.status.not_in(ACTIVE_STATUSES),
+                    SummaryJob.finished_at < now - timedelta(days=retention_days)
+                )
+            ).scalars().all()
+            for chunk in _chunks(expired):
+                for job in db.execute(select(SummaryJob).where(SummaryJob.id.in_(chunk))).scalars():
+                    db.delete(job)
+            db.commit()
+            if requeued or expired:
+                logger.info(f"Summary jobs: requeued {requeued} expired claims, purged {len(expired)} old jobs")
+            return requeued
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # Workers
+
+    def notify(self):
+        """Wake idle workers after a job is submitted."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _process(self, items: List[Row], token: str):
+        texts: Dict[str, str] = {}
+        for item in items:
+            texts.setdefault(item.text_hash, item.text)
+        digests = list(texts)
+        results: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        try:
+            try:
+                summaries = await self.summarize([texts[digest] for digest in digests])
+                results = dict(zip(digests, summaries))
+            except ConnectionError:
+                raise
+            except Exception as e:
+                if len(digests) == 1:
+                    errors[digests[0]] = str(e)
+                else:
+                    # Retry one by one so a single bad text only fails itself
+                    for digest in digests:
+                        try:
+                            results[digest] = (await self.summarize([texts[digest]]))[0]
+                        except ConnectionError:
+                            raise
+                        except Exception as item_error:
+                            errors[digest] = str(item_error)
+        except ConnectionError:
+            # The model backend is unreachable (e.g. restarting); requeue instead of failing the texts
+            await run_in_threadpool(self.release, [token])
+            raise
+        await run_in_threadpool(self.record, token, results, errors)
+        if errors:
+            logger.warning(f"Summary jobs: {len(errors)} of {len(digests)} texts failed in batch {token}")
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                if time.time() - self._last_maintenance >= MAINTENANCE_SECONDS:
+                    self._last_maintenance = time.time()
+                    await run_in_threadpool(self.maintain)
+                token = f"{os.getpid()}-{index}-{uuid.uuid4().hex[:8]}"
+                self._claims.add(token)
+                try:
+                    items = await run_in_threadpool(self.claim, token, self.batch_size)
+                    if items:
+                        await self._process(items, token)
+                        continue
+                finally:
+                    self._claims.discard(token)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Summary job worker error: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} summary job workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._claims:
+            # Hand unfinished batches back instead of waiting for their lease to expire
+            await run_in_threadpool(self.release, list(self._claims))
+            self._claims.clear()
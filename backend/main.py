@@ -1,22 +1,24 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPBearer
-import feedparser
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from pydantic import BaseModel
-import uuid
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
+import asyncio
 import logging
+import os
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 # Import our custom modules
-from database import get_db, User
+from database import get_db, User, ArticleInteraction, UserPreference
 from auth import (
     authenticate_user, 
     create_access_token, 
     get_current_user, 
+    get_current_user_optional,
     get_current_admin_user,
     get_password_hash,
     get_user_by_email,
@@ -24,9 +26,60 @@ from auth import (
     verify_password,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from models import UserCreate, UserLogin, UserResponse, Token, UserUpdate, PasswordChange
+from models import (
+    UserCreate, UserLogin, UserResponse, Token, UserUpdate, PasswordChange,
+    PreferencesUpdate, PreferencesResponse, InteractionCreate
+)
+from articles import FastJSONResponse, dumps, encode_articles, encode_cluster, encode_news_page, encode_page
+from ingestion import SnapshotStore, article_text, embed_texts
+from archive import ArchiveWriter, query_archive, recent_articles
+from summarization import LengthAwareSummarizer, SummaryCache
+from checkpoint import SNAPSHOT_CHECKPOINT, CheckpointedSnapshotStore
+from extraction import EXTRACT_FULL_TEXT, ContentExtractor
+from categorizer import CATEGORIZER, EmbeddingCategorizer, load_examples
+from jobs import JOB_MAX_ACTIVE, JOB_MAX_TEXTS, JOB_PRIORITIES, SummaryJobQueue
+from trending import TRENDING_TOP_K, TrendingTerms
+from profiling import PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS, PROFILE_REQUESTS, ProfilingMiddleware, RequestProfiler
+from inference import (
+    EMBEDDING_MODEL,
+    INFERENCE_READY_TIMEOUT,
+    INFERENCE_SOCKET,
+    SUMMARY_MODEL,
+    InferenceClient,
+    InferenceUnavailable,
+    RemoteEmbedder,
+    RemoteSummarizer
+)
+from personalization import InterestProfiles, encode_embedding, get_preferred_categories
+from admission import (
+    check_summarize_limits,
+    client_key,
+    model_scheduler,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    request_priority,
+    summarize_rate_limiter
+)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        # Warm trending terms from the archive so the first windows are not empty
+        await run_in_threadpool(lambda: trending_terms.observe(recent_articles(trending_terms.window_start())))
+    except Exception as e:
+        logger.warning(f"Could not load recent articles for trending terms: {e}")
+    # Checked in the background; model calls fail with InferenceUnavailable until ready
+    readiness = asyncio.create_task(report_inference_readiness()) if inference_client else None
+    await feed_store.start()
+    if length_aware_summarizer:
+        await summary_jobs.start()
+    yield
+    if readiness is not None:
+        readiness.cancel()
+    await summary_jobs.stop()
+    await feed_store.stop()
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -38,8 +91,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id"],
 )
 
+# Admins can profile a request with X-Profile: 1; slow requests are captured automatically
+request_profiler = RequestProfiler()
+if PROFILE_REQUESTS or request_profiler.slow_ms > 0:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
 class NewsArticle(BaseModel):
     id: str
     title: str
@@ -57,6 +116,11 @@ class NewsResponse(BaseModel):
     limit: int
     totalPages: int
 
+class ArchiveResponse(BaseModel):
+    articles: List[NewsArticle]
+    limit: int
+    nextCursor: Optional[str] = None
+
 class Cluster(BaseModel):
     id: str
     name: str
@@ -69,12 +133,51 @@ class ClusterResponse(BaseModel):
     limit: int
     totalPages: int
 
+class TrendingTerm(BaseModel):
+    term: str
+    kind: str  # term or entity
+    count: int
+    expected: float
+    burst: float
+
+class TrendingResponse(BaseModel):
+    terms: List[TrendingTerm]
+    recentHours: float
+    baselineHours: float
+    recentArticles: int
+    baselineArticles: int
+    updatedAt: Optional[str] = None
+
 class SummarizeRequest(BaseModel):
     texts: List[str]
 
 class SummarizeResponse(BaseModel):
     results: List[dict]
 
+class SummarizeJobRequest(BaseModel):
+    texts: List[str]
+    priority: Literal["high", "normal", "low"] = "normal"
+
+class SummarizeJobResult(BaseModel):
+    index: int
+    status: str
+    summary: Optional[str] = None
+    error: Optional[str] = None
+
+class SummarizeJobResponse(BaseModel):
+    id: str
+    status: str
+    priority: str
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    cancelled: int
+    createdAt: Optional[str] = None
+    updatedAt: Optional[str] = None
+    finishedAt: Optional[str] = None
+    results: Optional[List[SummarizeJobResult]] = None
+
 class AdminStats(BaseModel):
     total_users: int
     active_users: int
@@ -89,16 +192,84 @@ class UserListResponse(BaseModel):
     totalPages: int
 
 # Initialize ML models
+inference_client = None
 try:
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-    embedder = SentenceTransformer('all-MiniLM-L6-v2')
-    logger.info("ML models loaded successfully")
+    if INFERENCE_SOCKET:
+        # Models live in one shared inference server process (python inference.py)
+        inference_client = InferenceClient(INFERENCE_SOCKET)
+        summarizer = RemoteSummarizer(inference_client)
+        embedder = RemoteEmbedder(inference_client)
+        logger.info(f"Using shared inference server at {INFERENCE_SOCKET}")
+    else:
+        from transformers import pipeline
+        from sentence_transformers import SentenceTransformer
+
+        summarizer = pipeline("summarization", model=SUMMARY_MODEL)
+        embedder = SentenceTransformer(EMBEDDING_MODEL)
+        logger.info("ML models loaded successfully")
 except Exception as e:
     logger.warning(f"Failed to load ML models: {e}")
     logger.warning("News summarization features will be disabled")
     summarizer = None
     embedder = None
 
+async def report_inference_readiness():
+    """Log whether the shared inference server is up without holding up startup."""
+    if await inference_client.wait_ready_async(INFERENCE_READY_TIMEOUT):
+        logger.info(f"Inference server at {INFERENCE_SOCKET} is ready")
+    else:
+        logger.warning(f"Inference server at {INFERENCE_SOCKET} is not ready; model calls fail until it is")
+
+categorizer = None
+if CATEGORIZER == "embedding" and embedder is not None:
+    try:
+        # A remote embedder may still be loading; embed the examples on first use
+        categorizer = EmbeddingCategorizer(embedder, load_examples(), lazy=isinstance(embedder, RemoteEmbedder))
+        logger.info(f"Using embedding categorizer with categories: {categorizer.names}")
+    except Exception as e:
+        logger.warning(f"Failed to build embedding categorizer, using keyword rules: {e}")
+
+# In multi-worker mode start_server.py sets SHARED_SNAPSHOT_DIR so that one
+# leader ingests the feed and every worker maps the same snapshot
+SHARED_SNAPSHOT_DIR = os.getenv("SHARED_SNAPSHOT_DIR")
+trending_terms = TrendingTerms()
+summary_cache = SummaryCache()
+store_options = dict(
+    embedder=embedder,
+    summarizer=summarizer,
+    archive=ArchiveWriter(),
+    extractor=ContentExtractor() if EXTRACT_FULL_TEXT else None,
+    categorizer=categorizer,
+    trending=trending_terms,
+    summary_cache=summary_cache,
+    scheduler=model_scheduler
+)
+if SHARED_SNAPSHOT_DIR:
+    from shared_snapshot import SharedSnapshotStore
+    feed_store = SharedSnapshotStore(SHARED_SNAPSHOT_DIR, **store_options)
+elif SNAPSHOT_CHECKPOINT:
+    # A single process checkpoints its snapshot and summary cache for warm restarts
+    feed_store = CheckpointedSnapshotStore(SNAPSHOT_CHECKPOINT, **store_options)
+else:
+    feed_store = SnapshotStore(**store_options)
+interest_profiles = InterestProfiles()
+
+length_aware_summarizer = LengthAwareSummarizer(summarizer, cache=summary_cache) if summarizer else None
+
+async def run_model(key: str, priority: int, func, *args):
+    """Run a blocking model call in a worker thread once a model slot is free."""
+    async with model_scheduler.slot(key, priority):
+        return await run_in_threadpool(func, *args)
+
+async def summarize_job_texts(texts: List[str]) -> List[str]:
+    """Summarize one batch of queued job texts behind interactive requests."""
+    async def run_batch(batch: List[str]) -> List[str]:
+        return await run_model("summary-jobs", PRIORITY_BULK, length_aware_summarizer.run_batch, batch)
+
+    return await length_aware_summarizer.summarize_async(texts, run_batch)
+
+summary_jobs = SummaryJobQueue(summarize_job_texts)
+
 # Authentication endpoints
 @app.post("/api/auth/register", response_model=UserResponse)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
@@ -217,6 +388,70 @@ async def change_password(
     
     return {"message": "Password updated successfully"}
 
+# Personalization endpoints
+@app.get("/api/preferences", response_model=PreferencesResponse)
+async def get_preferences(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the current user's preferred categories."""
+    return PreferencesResponse(categories=get_preferred_categories(db, current_user.id))
+
+@app.put("/api/preferences", response_model=PreferencesResponse)
+async def update_preferences(
+    preferences: PreferencesUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Replace the current user's preferred categories."""
+    categories = sorted({c.strip().lower() for c in preferences.categories if c.strip()})
+    preference = db.query(UserPreference).filter(UserPreference.user_id == current_user.id).first()
+    if preference is None:
+        preference = UserPreference(user_id=current_user.id)
+        db.add(preference)
+    preference.categories = ",".join(categories)
+    db.commit()
+    interest_profiles.invalidate(current_user.id)
+    return PreferencesResponse(categories=categories)
+
+@app.post("/api/interactions", status_code=status.HTTP_201_CREATED)
+async def record_interaction(
+    interaction: InteractionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Record that the current user clicked or read an article."""
+    snapshot = await feed_store.get()
+    row = snapshot.row(interaction.article_id)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article not found"
+        )
+    article = snapshot.articles[row]
+    embedding = snapshot.embedding(article.id)
+    if embedding is None and embedder is not None:
+        try:
+            vectors = await run_model(
+                f"user:{current_user.id}", PRIORITY_INTERACTIVE, embed_texts, embedder, [article_text(article)]
+            )
+            embedding = vectors[0] if vectors is not None else None
+        except Exception as e:
+            # The interaction still counts; it just does not shape the interest vector
+            logger.warning(f"Recording interaction without an embedding: {str(e)}")
+
+    db.add(ArticleInteraction(
+        user_id=current_user.id,
+        article_id=article.id,
+        url=article.url,
+        title=article.title,
+        kind=interaction.kind,
+        embedding=encode_embedding(embedding)
+    ))
+    db.commit()
+    interest_profiles.invalidate(current_user.id)
+    return {"message": "Interaction recorded"}
+
 # Admin endpoints
 @app.get("/admin")
 async def admin_panel(current_user: User = Depends(get_current_admin_user)):
@@ -233,11 +468,10 @@ async def get_admin_stats(
     active_users = db.query(User).filter(User.is_active == True).count()
     admin_users = db.query(User).filter(User.is_admin == True).count()
     
-    # Get total articles from RSS feed
+    # Get total articles from the current feed snapshot
     try:
-        feed = feedparser.parse("https://feeds.bbci.co.uk/news/rss.xml")
-        total_articles = len(feed.entries[:100])  # Limit to 100 articles
-    except:
+        total_articles = len((await feed_store.get()).articles)
+    except Exception:
         total_articles = 0
     
     return AdminStats(
@@ -247,6 +481,53 @@ async def get_admin_stats(
         total_articles=total_articles
     )
 
+@app.get("/api/admin/ingestion")
+async def get_ingestion_stats(current_user: User = Depends(get_current_admin_user)):
+    """Get counters from the most recent feed ingestion cycle."""
+    snapshot = feed_store.current
+    return {
+        "snapshot_version": snapshot.version if snapshot else None,
+        "last_cycle": feed_store.ingest_stats()
+    }
+
+@app.get("/api/admin/profiles")
+async def list_profiles(current_user: User = Depends(get_current_admin_user)):
+    """List captured request and process profiles, newest first."""
+    return {
+        "profiles": [profile.to_dict() for profile in await run_in_threadpool(request_profiler.buffer.list)],
+        "slowThresholdMs": request_profiler.slow_ms
+    }
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, current_user: User = Depends(get_current_admin_user)):
+    """Download a profile as folded stacks for flamegraph tools."""
+    profile = await run_in_threadpool(request_profiler.buffer.get, profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'}
+    )
+
+@app.post("/api/admin/profile")
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Sample the whole worker process for a number of seconds."""
+    profile = await request_profiler.sample_process(seconds, interval_ms)
+    return PlainTextResponse(
+        profile.folded(),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"',
+            "X-Profile-Id": profile.id
+        }
+    )
+
 @app.get("/api/admin/users", response_model=UserListResponse)
 async def get_users(
     page: int = 1,
@@ -347,60 +628,56 @@ async def delete_user(
     
     return {"message": f"User {user.username} deleted successfully"}
 
-def categorize_article(text: str) -> Optional[str]:
-    text = text.lower()
-    categories = {
-        "entertainment": [
-            "movie", "film", "music", "concert", "festival", "actor", "actress", "tv", 
-            "television", "show", "celebrity", "premiere", "award", "drama", "comedy", 
-            "entertainment", "cinema", "theatre", "album", "streaming", "hollywood", 
-            "musical", "band", "performance", "red carpet", "oscars", "grammy", 
-            "netflix", "series", "director", "screenplay"
-        ],
-        "sports": [
-            "sport", "football", "cricket", "tennis", "athlete", "game", "match", 
-            "tournament", "olympics", "soccer", "basketball", "rugby", "championship", 
-            "team", "player", "coach", "league", "score", "stadium", "training"
-        ],
-        "crime": [
-            "murder", "theft", "assault", "robbery", "fraud", "arrest", "police", "crime", 
-            "homicide", "burglary", "court", "trial", "investigation", "suspect", "criminal", 
-            "law enforcement", "offence", "felony", "misdemeanor", "scandal", "corruption", 
-            "gang", "violence", "prosecution", "detective", "evidence", "jail"
-        ],
-        "politics": [
-            "election", "government", "policy", "minister", "parliament", "vote", 
-            "politician", "law", "brexit", "president", "prime minister", "congress", 
-            "senate", "legislation", "campaign", "debate", "diplomacy", "bill", 
-            "reform", "cabinet"
-        ],
-    }
-    for category, keywords in categories.items():
-        if any(keyword in text for keyword in keywords):
-            logger.info(f"Article categorized as {category}: {text[:100]}...")
-            return category
-    logger.info(f"Article not categorized: {text[:100]}...")
-    return None
-
-@app.get("/api/news", response_model=NewsResponse)
-async def get_news(categories: Optional[str] = None, page: int = 1, limit: int = 10):
-    feed = feedparser.parse("https://feeds.bbci.co.uk/news/rss.xml")
-    entries = feed.entries[:100]  # Fetch up to 100 articles
-    articles = []
-    
-    for entry in entries:
-        description = entry.get("description", "No description available")
-        category = categorize_article(entry.title + " " + description)
-        articles.append(NewsArticle(
-            id=str(uuid.uuid4()),
-            title=entry.title,
-            description=description,
-            url=entry.link,
-            source="BBC",
-            publishedAt=entry.get("published", ""),
-            category=category
+@app.get("/api/news", response_model=Union[NewsResponse, ArchiveResponse])
+async def get_news(
+    categories: Optional[str] = None,
+    page: int = 1,
+    limit: int = 10,
+    ranked: bool = False,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    source: Optional[str] = None,
+    current_user: Optional[User] = Depends(get_current_user_optional),
+    db: Session = Depends(get_db)
+):
+    """Get the live feed, or archived articles when from, to, cursor or source is given.
+
+    Archive queries are ordered by publication time and use cursor paging;
+    they cannot be ranked, so combining them with ranked=true is a 400.
+    """
+    # Time-range or cursor queries are served from the archive
+    if from_ is not None or to is not None or cursor is not None or source is not None:
+        if ranked:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ranked cannot be combined with from, to, cursor or source"
+            )
+        category_list = categories.lower().split(",") if categories else None
+        limit = max(1, min(limit, 100))  # report the page size actually served
+        try:
+            articles, next_cursor = query_archive(
+                db, category_list, source, from_, to, cursor, limit
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        logger.info(f"Archive query returned {len(articles)} articles")
+        return FastJSONResponse(encode_page(
+            "articles", encode_articles(articles), limit=limit, nextCursor=next_cursor
         ))
 
+    snapshot = await feed_store.get()
+    if ranked:
+        if current_user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Ranked feed requires authentication",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        articles = interest_profiles.rank(db, current_user.id, snapshot)
+    else:
+        articles = snapshot.articles
+
     # Filter articles by category if provided
     if categories:
         category_list = categories.lower().split(",")
@@ -413,57 +690,20 @@ async def get_news(categories: Optional[str] = None, page: int = 1, limit: int =
         logger.info(f"No category filter applied, returning {len(filtered_articles)} articles")
 
     total = len(filtered_articles)
-    total_pages = (total + limit - 1) // limit
     start = (page - 1) * limit
     end = start + limit
     paginated_articles = filtered_articles[start:end]
 
     logger.info(f"Returning page {page} with {len(paginated_articles)} articles")
-    return NewsResponse(
-        articles=paginated_articles,
-        total=total,
-        page=page,
-        limit=limit,
-        totalPages=total_pages
-    )
+    return FastJSONResponse(encode_news_page(paginated_articles, total, page, limit))
 
 @app.get("/api/clusters", response_model=ClusterResponse)
 async def get_clusters(page: int = 1, limit: int = 10):
-    feed = feedparser.parse("https://feeds.bbci.co.uk/news/rss.xml")
-    entries = feed.entries[:100]
-    articles = [
-        NewsArticle(
-            id=str(uuid.uuid4()),
-            title=entry.title,
-            description=entry.get("description", "No description available"),
-            url=entry.link,
-            source="BBC",
-            publishedAt=entry.get("published", ""),
-            category=categorize_article(entry.title + " " + entry.get("description", "No description available"))
-        ) for entry in entries
-    ]
-
-    # Summarize articles
-    texts = [article.description if article.description != "No description available" else article.title for article in articles]
-    summaries = []
-    if summarizer:
-        for text in texts:
-            try:
-                summary = summarizer(text, max_length=100, min_length=30, do_sample=False)[0]["summary_text"]
-                summaries.append(summary)
-            except Exception as e:
-                logger.error(f"Error summarizing text: {str(e)}")
-                summaries.append("Summary not available")
-    else:
-        # If summarizer is not available, use truncated text
-        for text in texts:
-            summaries.append(text[:100] + "..." if len(text) > 100 else text)
-
-    # Assign summaries to articles
-    for article, summary in zip(articles, summaries):
-        article.summary = summary
+    # Summaries are produced at ingestion time, only for new or changed entries
+    articles = (await feed_store.get()).articles
 
-    # Group articles by category as clusters
+    # Group articles by category as clusters (categories added to the
+    # embedding categorizer follow the built-in ones)
     cluster_dict = {
         "entertainment": [],
         "sports": [],
@@ -471,8 +711,8 @@ async def get_clusters(page: int = 1, limit: int = 10):
         "politics": []
     }
     for article in articles:
-        if article.category in cluster_dict:
-            cluster_dict[article.category].append(article)
+        if article.category:
+            cluster_dict.setdefault(article.category, []).append(article)
 
     # Log article counts per cluster
     for category, arts in cluster_dict.items():
@@ -480,12 +720,12 @@ async def get_clusters(page: int = 1, limit: int = 10):
 
     # Create clusters, only include non-empty ones
     cluster_list = [
-        Cluster(id=category, name=category.capitalize(), articles=articles)
-        for category, articles in cluster_dict.items()
-        if articles
+        (category, category.capitalize(), arts)
+        for category, arts in cluster_dict.items()
+        if arts
     ]
 
-    logger.info(f"Created {len(cluster_list)} clusters: {[c.name for c in cluster_list]}")
+    logger.info(f"Created {len(cluster_list)} clusters: {[name for _, name, _ in cluster_list]}")
 
     total = len(cluster_list)
     total_pages = (total + limit - 1) // limit
@@ -493,58 +733,128 @@ async def get_clusters(page: int = 1, limit: int = 10):
     end = start + limit
     paginated_clusters = cluster_list[start:end]
 
-    return ClusterResponse(
-        clusters=paginated_clusters,
+    clusters = b"[" + b",".join(encode_cluster(*cluster) for cluster in paginated_clusters) + b"]"
+    return FastJSONResponse(encode_page(
+        "clusters",
+        clusters,
         total=total,
         page=page,
         limit=limit,
         totalPages=total_pages
-    )
+    ))
+
+@app.get("/api/trending", response_model=TrendingResponse)
+async def get_trending(limit: int = Query(10, ge=1, le=TRENDING_TOP_K)):
+    """Terms and entities whose frequency is bursting in the recent window."""
+    # Make sure the latest feed entries have been counted
+    await feed_store.get()
+    view = feed_store.trending_terms()
+    return FastJSONResponse(dumps({**view, "terms": view["terms"][:limit]}))
 
 @app.get("/api/search", response_model=NewsResponse)
 async def search_news(q: str, page: int = 1, limit: int = 10):
-    feed = feedparser.parse("https://feeds.bbci.co.uk/news/rss.xml")
-    entries = feed.entries[:100]
-    articles = [
-        NewsArticle(
-            id=str(uuid.uuid4()),
-            title=entry.title,
-            description=entry.get("description", "No description available"),
-            url=entry.link,
-            source="BBC",
-            publishedAt=entry.get("published", ""),
-            category=categorize_article(entry.title + " " + entry.get("description", "No description available"))
-        ) for entry in entries
-    ]
-
-    filtered_articles = [
-        article for article in articles
-        if q.lower() in article.title.lower() or q.lower() in article.description.lower()
-    ]
+    # Trigram index lookup, verified against title, description and content
+    filtered_articles = (await feed_store.get()).search(q)
 
     logger.info(f"Search for '{q}' returned {len(filtered_articles)} articles")
-    return NewsResponse(
-        articles=filtered_articles,
-        total=len(filtered_articles),
-        page=page,
-        limit=limit,
-        totalPages=(len(filtered_articles) + limit - 1) // limit
-    )
+    return FastJSONResponse(encode_news_page(filtered_articles, len(filtered_articles), page, limit))
 
 @app.post("/summarize", response_model=SummarizeResponse)
-async def summarize(request: SummarizeRequest):
+async def summarize(
+    request: SummarizeRequest,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    check_summarize_limits(request.texts)
     if not summarizer:
         raise HTTPException(
             status_code=503, 
             detail="Summarization service is not available. Please install PyTorch and transformers."
         )
+    key = client_key(http_request, current_user)
+    await summarize_rate_limiter.check(key, cost=max(1, len(request.texts)))
     
     try:
-        results = []
-        for text in request.texts:
-            summary = summarizer(text, max_length=100, min_length=30, do_sample=False)[0]["summary_text"]
-            results.append({"summary": summary})
+        priority = request_priority(request.texts)
+
+        async def run_batch(batch: List[str]) -> List[str]:
+            # One slot per batch lets interactive callers interleave with bulk work
+            return await run_model(key, priority, length_aware_summarizer.run_batch, batch)
+
+        summaries = await length_aware_summarizer.summarize_async(request.texts, run_batch)
+        results = [{"summary": summary} for summary in summaries]
         return SummarizeResponse(results=results)
+    except InferenceUnavailable as e:
+        logger.error(f"Inference server unavailable: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Summarization service is temporarily unavailable"
+        )
     except Exception as e:
         logger.error(f"Error in summarize endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def get_owned_job(job_id: str, http_request: Request, current_user: Optional[User], offset: int = 0, limit: int = 0):
+    """Load a job for its submitter (or an admin); 404 for anyone else."""
+    found = await run_in_threadpool(summary_jobs.get, job_id, offset, limit)
+    if found is not None:
+        job, view = found
+        is_admin = current_user is not None and current_user.is_admin
+        if is_admin or job.owner == client_key(http_request, current_user):
+            return view
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Job not found"
+    )
+
+@app.post("/summarize/jobs", response_model=SummarizeJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_summarize_job(
+    request: SummarizeJobRequest,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """Queue texts for summarization and return the job id at once."""
+    if not request.texts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one text is required"
+        )
+    check_summarize_limits(request.texts, max_texts=JOB_MAX_TEXTS)
+    if not summarizer:
+        raise HTTPException(
+            status_code=503, 
+            detail="Summarization service is not available. Please install PyTorch and transformers."
+        )
+    key = client_key(http_request, current_user)
+    if await run_in_threadpool(summary_jobs.active_jobs, key) >= JOB_MAX_ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {JOB_MAX_ACTIVE} unfinished jobs per client"
+        )
+    # Charged in full: a large job leaves the caller's bucket in debt
+    await summarize_rate_limiter.check(key, cost=len(request.texts))
+
+    job = await run_in_threadpool(summary_jobs.submit, key, request.texts, JOB_PRIORITIES[request.priority])
+    summary_jobs.notify()
+    return job
+
+@app.get("/summarize/jobs/{job_id}", response_model=SummarizeJobResponse)
+async def get_summarize_job(
+    job_id: str,
+    http_request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=0, le=1000),
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """Job progress with results (partial while running) from offset."""
+    return await get_owned_job(job_id, http_request, current_user, offset, limit)
+
+@app.delete("/summarize/jobs/{job_id}", response_model=SummarizeJobResponse)
+async def cancel_summarize_job(
+    job_id: str,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_current_user_optional)
+):
+    """Cancel a job; summaries finished so far are kept."""
+    await get_owned_job(job_id, http_request, current_user)
+    return await run_in_threadpool(summary_jobs.cancel, job_id)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -40,4 +40,14 @@ class UserUpdate(BaseModel):
 class PasswordChange(BaseModel):
     current_password: str
     new_password: str
-    confirm_new_password: str 
\ No newline at end of file
+    confirm_new_password: str
+
+class PreferencesUpdate(BaseModel):
+    categories: List[str]
+
+class PreferencesResponse(BaseModel):
+    categories: List[str]
+
+class InteractionCreate(BaseModel):
+    article_id: str
+    kind: Literal["click", "read"] = "click"
@@ -0,0 +1,165 @@
+"""
+Per-user interest vectors and ranked feeds.
+
+A user's interest vector is the recency-weighted mean of the embeddings of the
+articles they clicked or read. Ranking a snapshot is one matrix-vector product
+against the snapshot's embedding matrix plus a boost for preferred categories.
+Interest vectors and ranked orders are cached per user and keyed by the
+snapshot version, the user's latest interaction id and the preference update
+time. Those are read from the database on every ranked request, so a change
+recorded by another worker is picked up on the next request.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from articles import Article
+from database import ArticleInteraction, UserPreference
+from ingestion import FeedSnapshot
+
+logger = logging.getLogger(__name__)
+
+MAX_INTERACTIONS = 50     # most recent interactions that shape the interest vector
+RECENCY_DECAY = 0.95      # weight multiplier per older interaction
+CATEGORY_BOOST = 0.25     # added to the similarity of preferred-category articles
+READ_WEIGHT = 2.0         # a read counts more than a click
+
+def parse_categories(value: Optional[str]) -> List[str]:
+    """Split a comma-separated category string."""
+    if not value:
+        return []
+    return [c.strip().lower() for c in value.split(",") if c.strip()]
+
+def get_preferred_categories(db: Session, user_id: int) -> List[str]:
+    preference = db.query(UserPreference).filter(UserPreference.user_id == user_id).first()
+    return parse_categories(preference.categories if preference else None)
+
+class UserInputs(NamedTuple):
+    """What a user's ranking depends on, as stored in the database."""
+    latest_interaction: Optional[int]
+    preferences_updated: Optional[datetime]
+    preferred: List[str]
+
+def get_user_inputs(db: Session, user_id: int) -> UserInputs:
+    latest = (
+        db.query(ArticleInteraction.id)
+        .filter(ArticleInteraction.user_id == user_id)
+        .order_by(ArticleInteraction.created_at.desc(), ArticleInteraction.id.desc())
+        .limit(1)
+        .scalar()
+    )
+    preference = db.query(UserPreference).filter(UserPreference.user_id == user_id).first()
+    return UserInputs(
+        latest_interaction=latest,
+        preferences_updated=preference.updated_at if preference else None,
+        preferred=parse_categories(preference.categories if preference else None),
+    )
+
+def encode_embedding(vector: Optional[np.ndarray]) -> Optional[bytes]:
+    if vector is None:
+        return None
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def decode_embedding(blob: Optional[bytes]) -> Optional[np.ndarray]:
+    if not blob:
+        return None
+    return np.frombuffer(blob, dtype=np.float32)
+
+def build_interest_vector(interactions: List[ArticleInteraction]) -> Optional[np.ndarray]:
+    """Combine interaction embeddings (newest first) into one unit vector."""
+    vectors = []
+    weights = []
+    for age, interaction in enumerate(interactions):
+        vector = decode_embedding(interaction.embedding)
+        if vector is None:
+            continue
+        if vectors and vector.shape != vectors[0].shape:
+            continue  # embedding model changed, ignore stale rows
+        vectors.append(vector)
+        weight = READ_WEIGHT if interaction.kind == "read" else 1.0
+        weights.append(weight * RECENCY_DECAY ** age)
+    if not vectors:
+        return None
+    interest = np.average(np.stack(vectors), axis=0, weights=weights).astype(np.float32)
+    norm = np.linalg.norm(interest)
+    if norm == 0:
+        return None
+    return interest / norm
+
+class InterestProfiles:
+    """Caches interest vectors and ranked orders per user.
+
+    Each entry carries the key it was computed for and is recomputed when the
+    key differs: (snapshot version, latest interaction id) for vectors, plus
+    the preference update time for ranked orders.
+    """
+
+    def __init__(self):
+        self._vectors: Dict[int, Tuple[tuple, Optional[np.ndarray]]] = {}
+        self._rankings: Dict[int, Tuple[tuple, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, user_id: int):
+        """Forget this worker's cached state after a user's inputs change."""
+        with self._lock:
+            self._vectors.pop(user_id, None)
+            self._rankings.pop(user_id, None)
+
+    def interest_vector(self, db: Session, user_id: int, version: int,
+                        latest_interaction: Optional[int]) -> Optional[np.ndarray]:
+        key = (version, latest_interaction)
+        with self._lock:
+            cached = self._vectors.get(user_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if latest_interaction is None:
+            vector = None
+        else:
+            interactions = (
+                db.query(ArticleInteraction)
+                .filter(ArticleInteraction.user_id == user_id)
+                .order_by(ArticleInteraction.created_at.desc())
+                .limit(MAX_INTERACTIONS)
+                .all()
+            )
+            vector = build_interest_vector(interactions)
+        with self._lock:
+            self._vectors[user_id] = (key, vector)
+        return vector
+
+    def _score(self, snapshot: FeedSnapshot, vector: Optional[np.ndarray], preferred: List[str]) -> np.ndarray:
+        scores = np.zeros(len(snapshot.articles), dtype=np.float32)
+        if vector is not None and snapshot.embeddings is not None \
+                and snapshot.embeddings.shape[1] == vector.shape[0]:
+            scores += snapshot.embeddings @ vector
+        if preferred:
+            preferred_set = set(preferred)
+            boost = np.fromiter(
+                (article.category in preferred_set for article in snapshot.articles),
+                dtype=np.float32,
+                count=len(snapshot.articles),
+            )
+            scores += CATEGORY_BOOST * boost
+        return scores
+
+    def rank(self, db: Session, user_id: int, snapshot: FeedSnapshot) -> List[Article]:
+        """Return the snapshot's articles ordered by predicted interest."""
+        inputs = get_user_inputs(db, user_id)
+        key = (snapshot.version, inputs.latest_interaction, inputs.preferences_updated)
+        with self._lock:
+            cached = self._rankings.get(user_id)
+        if cached is not None and cached[0] == key:
+            order = cached[1]
+        else:
+            vector = self.interest_vector(db, user_id, snapshot.version, inputs.latest_interaction)
+            scores = self._score(snapshot, vector, inputs.preferred)
+            # Stable sort keeps feed order among equally scored articles
+            order = np.argsort(-scores, kind="stable")
+            with self._lock:
+                self._rankings[user_id] = (key, order)
+            logger.info(f"Ranked snapshot v{snapshot.version} for user {user_id}")
+        return [snapshot.articles[i] for i in order]
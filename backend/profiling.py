@@ -0,0 +1,395 @@
+"""
+On-demand sampling profiler and slow-request capture for admins.
+
+Stacks are sampled from every thread with sys._current_frames() on a
+background thread, so profiled code runs unmodified. Idle threads (an event
+loop waiting in select, pool workers waiting for work) are skipped, and
+samples are aggregated in the folded-stack format ("frame;frame;frame count")
+that flamegraph.pl, speedscope and inferno read directly.
+
+- Single request: an admin sends `X-Profile: 1` (or `?profile=1`). The
+  request is sampled while it runs, and the response carries an
+  `X-Profile-Id` header naming the stored profile.
+- Whole process: POST /api/admin/profile samples for N seconds.
+- Slow requests: a watchdog starts sampling a request once it has been
+  running for half of PROFILE_SLOW_MS. If the request ends over the
+  threshold, its stacks are kept. Fast requests cost one dictionary insert.
+
+Profiles are kept in a bounded buffer, oldest evicted first. With several
+workers (PROFILE_DIR, or a `profiles` directory under SHARED_SNAPSHOT_DIR in
+production) the buffer is a directory of JSON files, so a profile captured by
+one worker can be listed and downloaded through any other. Otherwise it lives
+in the memory of the single process. Samples of concurrent requests are not
+separated; every thread except the profiler's own is sampled. The middleware
+is plain ASGI and is only installed when request profiling or slow-request
+capture is enabled.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth import get_current_admin_user, get_current_user
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))  # 0 disables slow-request capture
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "true").lower() == "true"  # admin X-Profile header
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+# Shared between workers; defaults next to the shared snapshot in production
+PROFILE_DIR = os.getenv("PROFILE_DIR") or (
+    os.path.join(os.environ["SHARED_SNAPSHOT_DIR"], "profiles") if os.getenv("SHARED_SNAPSHOT_DIR") else None
+)
+PROFILE_MAX_SECONDS = 60
+PROFILE_HEADER = b"x-profile"
+MAX_STACKS_PER_PROFILE = 5000
+UNWATCHED_PATHS = ("/api/admin/profile",)  # deliberate long-running samples
+IDLE_FRAMES = {("selectors.py", "select"), ("threading.py", "wait")}
+
+_profiler_threads: Set[int] = set()  # samplers and the watchdog never show up in profiles
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_stacks() -> List[str]:
+    """One folded stack per busy thread, root first, prefixed with the thread name."""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = []
+    for ident, frame in sys._current_frames().items():
+        if ident in _profiler_threads:
+            continue
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+            continue
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        labels.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+        stacks.append(";".join(reversed(labels)))
+    return stacks
+
+def new_profile_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+def add_samples(samples: Counter, stacks: List[str]):
+    for stack in stacks:
+        if stack in samples or len(samples) < MAX_STACKS_PER_PROFILE:
+            samples[stack] += 1
+
+class Profile:
+    """A captured profile and what it was for."""
+    __slots__ = ("id", "kind", "method", "path", "status_code", "duration_ms", "interval_ms", "created_at", "samples")
+
+    def __init__(self, kind: str, samples: Counter, duration_ms: float, interval_ms: float,
+                 method: Optional[str] = None, path: Optional[str] = None, status_code: Optional[int] = None,
+                 profile_id: Optional[str] = None):
+        self.id = profile_id or new_profile_id()
+        self.kind = kind  # request, slow or process
+        self.method = method
+        self.path = path
+        self.status_code = status_code
+        self.duration_ms = round(duration_ms, 1)
+        self.interval_ms = interval_ms
+        self.created_at = datetime.utcnow()
+        self.samples = samples
+
+    @classmethod
+    def from_dict(cls, data: dict, stacks: Dict[str, int]) -> "Profile":
+        profile = cls(
+            data["kind"], Counter(stacks), data["durationMs"], data["intervalMs"],
+            data["method"], data["path"], data["statusCode"], data["id"]
+        )
+        profile.created_at = datetime.fromisoformat(data["createdAt"])
+        return profile
+
+    def folded(self) -> str:
+        """Folded stacks, heaviest first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "method": self.method,
+            "path": self.path,
+            "statusCode": self.status_code,
+            "durationMs": self.duration_ms,
+            "intervalMs": self.interval_ms,
+            "samples": sum(self.samples.values()),
+            "createdAt": self.created_at.isoformat(),
+        }
+
+class ProfileBuffer:
+    """The most recent profiles, oldest evicted first.
+
+    With a directory each profile is one `<id>.json` file, written atomically,
+    and every worker pointed at the directory sees the same profiles. The file
+    operations block, so async callers run them in the threadpool.
+    """
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE, directory: Optional[str] = PROFILE_DIR):
+        self.size = size
+        self.directory = directory
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def _files(self) -> List[str]:
+        """Profile files, newest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue  # evicted by another worker
+        return [path for _, path in sorted(entries, reverse=True)]
+
+    def _read(self, path: str) -> Optional[Profile]:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return Profile.from_dict(data["profile"], data["stacks"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def add(self, profile: Profile) -> Profile:
+        if self.directory:
+            path = self._path(profile.id)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"profile": profile.to_dict(), "stacks": dict(profile.samples)}, f)
+            os.replace(tmp_path, path)
+            for stale in self._files()[self.size:]:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            return profile
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        if self.directory:
+            if not profile_id.isalnum():
+                return None
+            return self._read(self._path(profile_id))
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Profile]:
+        if self.directory:
+            profiles = (self._read(path) for path in self._files())
+            return [profile for profile in profiles if profile is not None]
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+class Sampler:
+    """Samples every thread at a fixed interval until stopped."""
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._started = 0.0
+
+    def _run(self):
+        _profiler_threads.add(threading.get_ident())
+        try:
+            while not self._stop.wait(self.interval_ms / 1000):
+                add_samples(self.samples, sample_stacks())
+        finally:
+            _profiler_threads.discard(threading.get_ident())
+
+    def start(self) -> "Sampler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> float:
+        """Stop sampling; returns the elapsed milliseconds."""
+        self._stop.set()
+        self._thread.join()
+        return (time.perf_counter() - self._started) * 1000
+
+class _InFlight:
+    __slots__ = ("started", "samples")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()
+
+def is_admin_request(authorization: str) -> bool:
+    """Apply the get_current_admin_user check to a raw Authorization header."""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    db = SessionLocal()
+    try:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        get_current_admin_user(get_current_user(credentials, db))
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+def profile_authorization(scope: Scope) -> Optional[str]:
+    """The Authorization header of a request asking to be profiled, else None."""
+    wanted = None
+    authorization = ""
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            wanted = value
+        elif name == b"authorization":
+            authorization = value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if wanted is None and b"profile=" in query:
+        for pair in query.split(b"&"):
+            if pair.startswith(b"profile="):
+                wanted = pair[8:]
+    return authorization if wanted in (b"1", b"true") else None
+
+class RequestProfiler:
+    """Per-request profiling on demand plus the slow-request watchdog."""
+
+    def __init__(
+        self,
+        buffer: Optional[ProfileBuffer] = None,
+        slow_ms: float = PROFILE_SLOW_MS,
+        interval_ms: float = PROFILE_INTERVAL_MS
+    ):
+        self.buffer = buffer or ProfileBuffer()
+        self.slow_ms = slow_ms
+        self.interval_ms = interval_ms
+        self._in_flight: Dict[int, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def _watch(self):
+        _profiler_threads.add(threading.get_ident())
+        arm = self.slow_ms / 2000  # seconds
+        while True:
+            now = time.perf_counter()
+            with self._lock:
+                armed = [entry for entry in self._in_flight.values() if now - entry.started >= arm]
+            if not armed:
+                time.sleep(min(arm / 2, 0.05))
+                continue
+            stacks = sample_stacks()
+            with self._lock:
+                for entry in armed:
+                    add_samples(entry.samples, stacks)
+            time.sleep(self.interval_ms / 1000)
+
+    def _ensure_watchdog(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._watchdog is None and self.slow_ms > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="slow-request-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def sample_process(self, seconds: float, interval_ms: float) -> Profile:
+        """Sample the whole process for a number of seconds."""
+        sampler = Sampler(interval_ms).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            duration = sampler.stop()
+        return await run_in_threadpool(self.buffer.add, Profile("process", sampler.samples, duration, interval_ms))
+
+    async def profile_request(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send):
+        """Run one request under a sampler and name the profile in the response."""
+        profile_id = new_profile_id()
+        status_code = 500
+
+        async def send_with_id(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        sampler = Sampler(self.interval_ms).start()
+        try:
+            await app(scope, receive, send_with_id)
+        finally:
+            duration = sampler.stop()
+            await run_in_threadpool(self.buffer.add, Profile(
+                "request", sampler.samples, duration, self.interval_ms,
+                scope["method"], scope["path"], status_code, profile_id
+            ))
+
+    async def watch_request(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send):
+        """Run one request under the slow-request watchdog."""
+        self._ensure_watchdog()
+        entry = _InFlight()
+        key = id(entry)
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with self._lock:
+            self._in_flight[key] = entry
+        try:
+            await app(scope, receive, send_with_status)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            duration = (time.perf_counter() - entry.started) * 1000
+            if duration >= self.slow_ms:
+                await run_in_threadpool(self.buffer.add, Profile(
+                    "slow", entry.samples, duration, self.interval_ms,
+                    scope["method"], scope["path"], status_code
+                ))
+                logger.warning(f"Slow request {scope['method']} {scope['path']} took {duration:.0f} ms, profile captured")
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware routing requests to a RequestProfiler."""
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler, profile_requests: bool = PROFILE_REQUESTS):
+        self.app = app
+        self.profiler = profiler
+        self.profile_requests = profile_requests
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.profile_requests:
+            authorization = profile_authorization(scope)
+            # The admin check queries the database, so keep it off the event loop
+            if authorization is not None and await run_in_threadpool(is_admin_request, authorization):
+                await self.profiler.profile_request(self.app, scope, receive, send)
+                return
+        if self.profiler.slow_ms > 0 and not scope["path"].startswith(UNWATCHED_PATHS):
+            await self.profiler.watch_request(self.app, scope, receive, send)
+            return
+        await self.app(scope, receive, send)
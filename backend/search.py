@@ -0,0 +1,88 @@
+"""
+Trigram index for substring search over a snapshot.
+
+/api/search matches the query as a substring of an article's title,
+description or extracted content. The index maps every three-character
+sequence of the lowercased text to the sorted rows containing it, so a query
+only verifies the rows that contain all of its trigrams instead of scanning
+every article. The index is three flat numpy arrays, which lets snapshot
+files store it and memory-map it back.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from articles import Article
+
+FIELD_SEPARATOR = "\x00"
+
+def searchable_text(article: Article) -> str:
+    parts = [article.title.lower(), article.description.lower()]
+    if article.content:
+        parts.append(article.content.lower())
+    return FIELD_SEPARATOR.join(parts)
+
+def matches(article: Article, query: str) -> bool:
+    """The search predicate; query is already lowercased."""
+    return (
+        query in article.title.lower() or query in article.description.lower()
+        or (article.content is not None and query in article.content.lower())
+    )
+
+def trigram_keys(text: str) -> np.ndarray:
+    """Distinct trigrams of text, each packed into a uint64 (21 bits per code point)."""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < 3:
+        return np.zeros(0, dtype=np.uint64)
+    keys = (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+    return np.unique(keys)
+
+class SearchIndex:
+    """Sorted trigram keys with offsets into one postings array of article rows."""
+    __slots__ = ("keys", "offsets", "postings")
+
+    def __init__(self, keys: np.ndarray, offsets: np.ndarray, postings: np.ndarray):
+        self.keys = keys          # uint64, sorted
+        self.offsets = offsets    # uint32, len(keys) + 1
+        self.postings = postings  # uint32 rows, ascending within each key
+
+    @classmethod
+    def build(cls, articles: List[Article]) -> "SearchIndex":
+        per_row = [trigram_keys(searchable_text(article)) for article in articles]
+        if not per_row or not sum(len(keys) for keys in per_row):
+            return cls(np.zeros(0, np.uint64), np.zeros(1, np.uint32), np.zeros(0, np.uint32))
+        all_keys = np.concatenate(per_row)
+        all_rows = np.repeat(np.arange(len(per_row), dtype=np.uint32), [len(keys) for keys in per_row])
+        # Stable sort keeps rows ascending within each key
+        order = np.argsort(all_keys, kind="stable")
+        keys, counts = np.unique(all_keys[order], return_counts=True)
+        offsets = np.zeros(len(keys) + 1, dtype=np.uint32)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(keys, offsets, all_rows[order])
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Rows that may contain query, or None when it is too short to narrow down."""
+        wanted = trigram_keys(query)
+        if not len(wanted):
+            return None
+        positions = np.searchsorted(self.keys, wanted)
+        lists = []
+        for key, position in zip(wanted, positions):
+            if position >= len(self.keys) or self.keys[position] != key:
+                return np.zeros(0, dtype=np.uint32)
+            lists.append(self.postings[self.offsets[position]:self.offsets[position + 1]])
+        lists.sort(key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+            if not len(rows):
+                break
+        return rows
+
+    def search(self, articles: List[Article], query: str) -> List[Article]:
+        """Articles containing query, in snapshot order."""
+        query = query.lower()
+        rows = self.candidates(query)
+        if rows is None:
+            return [article for article in articles if matches(article, query)]
+        return [articles[row] for row in rows.tolist() if matches(articles[row], query)]
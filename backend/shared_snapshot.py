@@ -0,0 +1,393 @@
+"""
+Article snapshot shared between API worker processes.
+
+One worker at a time holds an exclusive file lock and acts as the ingestion
+leader. It builds each snapshot, writes it to `snapshot.bin` in a binary
+format and bumps a version counter in a small memory-mapped control file. The
+other workers only read the counter; when it changes they memory-map the new
+snapshot file. The embedding matrix and search index are used straight from
+the mapping, so every worker shares the same page-cache copy. When the leader
+exits its lock is released and another worker takes over on its next poll.
+
+The format is a header and a table of checksummed, 16-byte aligned sections
+(article JSON, float32 embeddings, search index arrays, and checkpoint state
+such as cached summaries). The same files serve as checkpoints: a restarted
+server maps the last snapshot back in, and a file that is corrupted or has
+another format version is ignored and rebuilt.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from articles import Article, dumps, loads
+from ingestion import FeedSnapshot, SnapshotStore
+from search import SearchIndex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"KKSNAP\x00\x01"
+SNAPSHOT_FORMAT_VERSION = 2
+# magic, format version, snapshot version, created_at, section count, section table crc32
+HEADER = struct.Struct("<8sIQdII")
+# name, dtype, offset, length in bytes, crc32
+SECTION = struct.Struct("<4s4sQQI")
+CONTROL = struct.Struct("<Q")
+ALIGNMENT = 16
+LEADER_POLL_SECONDS = float(os.getenv("LEADER_POLL_SECONDS", "5"))
+FIRST_SNAPSHOT_WAIT_SECONDS = float(os.getenv("FIRST_SNAPSHOT_WAIT_SECONDS", "30"))
+
+# Sections: article JSON, embedding matrix, the search index arrays and the
+# state used by checkpoints (feed validators and cached summaries)
+META, EMBEDDINGS, SEARCH_KEYS, SEARCH_OFFSETS, SEARCH_POSTINGS, STATE = (
+    b"META", b"EMBD", b"SKEY", b"SOFF", b"SPST", b"STAT"
+)
+JSON_DTYPE = b"json"
+
+class SnapshotFormatError(Exception):
+    """Raised when a snapshot file is truncated, corrupted or of another format."""
+
+def _padding(offset: int) -> int:
+    return (-offset) % ALIGNMENT
+
+def _dtype_code(array: np.ndarray) -> bytes:
+    return array.dtype.str.encode("ascii").ljust(4, b"\x00")
+
+def encode_snapshot(snapshot: FeedSnapshot, state: Optional[dict] = None) -> bytes:
+    """Serialize a snapshot (and optionally checkpoint state) into the binary format."""
+    dim = snapshot.embeddings.shape[1] if snapshot.embeddings is not None else 0
+    meta = {"articles": [article.to_record() for article in snapshot.articles], "embeddingDim": dim}
+    sections: List[Tuple[bytes, bytes, bytes]] = [(META, JSON_DTYPE, dumps(meta))]
+    arrays = [(SEARCH_KEYS, snapshot.search_index.keys), (SEARCH_OFFSETS, snapshot.search_index.offsets),
+              (SEARCH_POSTINGS, snapshot.search_index.postings)]
+    if dim:
+        arrays.insert(0, (EMBEDDINGS, np.ascontiguousarray(snapshot.embeddings, dtype=np.float32)))
+    for name, array in arrays:
+        array = np.ascontiguousarray(array)
+        sections.append((name, _dtype_code(array), array.tobytes()))
+    if state is not None:
+        sections.append((STATE, JSON_DTYPE, dumps(state)))
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    table, chunks = b"", []
+    for name, dtype, payload in sections:
+        pad = _padding(offset)
+        chunks.append(b"\x00" * pad + payload)
+        offset += pad
+        table += SECTION.pack(name, dtype, offset, len(payload), zlib.crc32(payload))
+        offset += len(payload)
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, snapshot.version, snapshot.created_at,
+        len(sections), zlib.crc32(table),
+    )
+    return header + table + b"".join(chunks)
+
+def _read_sections(buffer) -> Tuple[int, float, Dict[bytes, Tuple[bytes, int, int, int]]]:
+    if len(buffer) < HEADER.size:
+        raise SnapshotFormatError("snapshot file is truncated")
+    magic, format_version, version, created_at, count, table_crc = HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotFormatError("not a snapshot file")
+    if format_version != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotFormatError(f"unsupported snapshot format {format_version}")
+    table_end = HEADER.size + SECTION.size * count
+    if len(buffer) < table_end:
+        raise SnapshotFormatError("snapshot file is truncated")
+    if zlib.crc32(memoryview(buffer)[HEADER.size:table_end]) != table_crc:
+        raise SnapshotFormatError("snapshot section table checksum mismatch")
+    sections = {}
+    for i in range(count):
+        name, dtype, offset, length, crc = SECTION.unpack_from(buffer, HEADER.size + i * SECTION.size)
+        if offset + length > len(buffer):
+            raise SnapshotFormatError("snapshot file is truncated")
+        sections[name] = (dtype, offset, length, crc)
+    return version, created_at, sections
+
+def _section(buffer, sections: dict, name: bytes, required: bool = True):
+    """Checksum-verified section as JSON or a zero-copy numpy array."""
+    if name not in sections:
+        if required:
+            raise SnapshotFormatError(f"snapshot has no {name.decode()} section")
+        return None
+    dtype, offset, length, crc = sections[name]
+    payload = memoryview(buffer)[offset:offset + length]
+    if zlib.crc32(payload) != crc:
+        raise SnapshotFormatError(f"snapshot {name.decode()} checksum mismatch")
+    if dtype == JSON_DTYPE:
+        return loads(bytes(payload))
+    item = np.dtype(dtype.rstrip(b"\x00").decode("ascii"))
+    return np.frombuffer(buffer, dtype=item, count=length // item.itemsize, offset=offset)
+
+def decode_snapshot(buffer) -> FeedSnapshot:
+    """Parse a snapshot from bytes or a memory map without copying arrays."""
+    version, created_at, sections = _read_sections(buffer)
+    meta = _section(buffer, sections, META)
+    articles = [Article.from_dict(item) for item in meta["articles"]]
+    embeddings = None
+    if meta["embeddingDim"]:
+        embeddings = _section(buffer, sections, EMBEDDINGS)
+        if len(embeddings) != len(articles) * meta["embeddingDim"]:
+            raise SnapshotFormatError("snapshot embedding shape mismatch")
+        embeddings = embeddings.reshape(len(articles), meta["embeddingDim"])
+    search_index = SearchIndex(
+        _section(buffer, sections, SEARCH_KEYS),
+        _section(buffer, sections, SEARCH_OFFSETS),
+        _section(buffer, sections, SEARCH_POSTINGS),
+    )
+    return FeedSnapshot(version, articles, embeddings, created_at=created_at, search_index=search_index)
+
+def decode_state(buffer) -> dict:
+    """Checkpoint state stored with a snapshot ({} when there is none)."""
+    _, _, sections = _read_sections(buffer)
+    return _section(buffer, sections, STATE, required=False) or {}
+
+def write_snapshot_file(path: str, snapshot: FeedSnapshot, state: Optional[dict] = None):
+    """Atomically replace `path` with the encoded snapshot."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_snapshot(snapshot, state))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _map(path: str) -> mmap.mmap:
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def map_snapshot_file(path: str) -> FeedSnapshot:
+    """Memory-map a snapshot file read-only and decode it."""
+    # The arrays keep the mapping alive for as long as they are referenced
+    return decode_snapshot(_map(path))
+
+def load_checkpoint(path: str) -> Tuple[FeedSnapshot, dict]:
+    """Memory-map a snapshot file and decode it with its checkpoint state."""
+    mapping = _map(path)
+    return decode_snapshot(mapping), decode_state(mapping)
+
+class SnapshotChannel:
+    """Files in a directory through which the leader publishes snapshots."""
+
+    def __init__(self, directory: str):
+        if fcntl is None:
+            raise RuntimeError("Shared snapshots require a POSIX platform")
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, "snapshot.bin")
+        self.lock_path = os.path.join(directory, "ingest.lock")
+        self.stats_path = os.path.join(directory, "stats.json")
+        self.trending_path = os.path.join(directory, "trending.json")
+        control_path = os.path.join(directory, "control")
+        fd = os.open(control_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < CONTROL.size:
+                os.ftruncate(fd, CONTROL.size)
+            self._control = mmap.mmap(fd, CONTROL.size)
+        finally:
+            os.close(fd)
+        self._lock_fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_fd is not None
+
+    def try_lead(self) -> bool:
+        """Try to become the ingestion leader without blocking."""
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        logger.info(f"Worker {os.getpid()} is now the ingestion leader")
+        return True
+
+    def published_version(self) -> int:
+        return CONTROL.unpack_from(self._control, 0)[0]
+
+    def _write_json(self, path: str, data: dict):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(dumps(data))
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                return loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def publish(
+        self,
+        snapshot: FeedSnapshot,
+        stats: Optional[dict] = None,
+        trending: Optional[dict] = None,
+        state: Optional[dict] = None
+    ):
+        write_snapshot_file(self.snapshot_path, snapshot, state)
+        if stats is not None:
+            self._write_json(self.stats_path, stats)
+        if trending is not None:
+            self._write_json(self.trending_path, trending)
+        CONTROL.pack_into(self._control, 0, snapshot.version)
+        self._control.flush()
+
+    def read_stats(self) -> Optional[dict]:
+        return self._read_json(self.stats_path)
+
+    def read_trending(self) -> Optional[dict]:
+        return self._read_json(self.trending_path)
+
+    def load(self) -> FeedSnapshot:
+        return map_snapshot_file(self.snapshot_path)
+
+    def load_checkpoint(self) -> Tuple[FeedSnapshot, dict]:
+        return load_checkpoint(self.snapshot_path)
+
+    def checkpoint(self, snapshot: FeedSnapshot, state: dict):
+        """Rewrite the published snapshot with fresh state, keeping its version."""
+        write_snapshot_file(self.snapshot_path, snapshot, state)
+
+    def close(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self._control.close()
+
+class SharedSnapshotStore(SnapshotStore):
+    """Snapshot store for multi-worker deployments backed by a SnapshotChannel."""
+
+    def __init__(self, directory: str, embedder=None, **kwargs):
+        super().__init__(embedder=embedder, **kwargs)
+        self.channel = SnapshotChannel(directory)
+        self._task: Optional[asyncio.Task] = None
+        self._trending: Optional[Tuple[int, Optional[dict]]] = None  # (version, view) read from the channel
+
+    def _refresh_from_channel(self):
+        version = self.channel.published_version()
+        if version == 0 or (self._snapshot is not None and self._snapshot.version >= version):
+            return
+        try:
+            self._snapshot = self.channel.load()
+            logger.info(f"Worker {os.getpid()} mapped snapshot v{self._snapshot.version}")
+        except (OSError, ValueError, KeyError, SnapshotFormatError) as e:
+            logger.error(f"Failed to map shared snapshot: {str(e)}")
+
+    async def _ingest(self):
+        snapshot = await self._build(self.channel.published_version() + 1)
+        await run_in_threadpool(
+            self.channel.publish, snapshot, self.last_stats.to_dict(), self.trending_terms(), self.checkpoint_state()
+        )
+        self._snapshot = snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                if self.channel.try_lead():
+                    async with self._lock:
+                        self._refresh_from_channel()
+                        if not self._is_fresh(self._snapshot):
+                            await self._ingest()
+                    delay = max(1.0, self._snapshot.created_at + self.refresh_seconds - time.time())
+                    await asyncio.sleep(delay)
+                else:
+                    self._refresh_from_channel()
+                    await asyncio.sleep(LEADER_POLL_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Snapshot loop error: {str(e)}")
+                await asyncio.sleep(LEADER_POLL_SECONDS)
+
+    def ingest_stats(self) -> Optional[dict]:
+        """Counters from the leader's most recent ingestion cycle."""
+        return self.channel.read_stats()
+
+    def trending_terms(self) -> Optional[dict]:
+        """The leader counts terms; other workers serve what it last published."""
+        if self.trending is None or self.channel.is_leader:
+            return super().trending_terms()
+        version = self.channel.published_version()
+        if self._trending is None or self._trending[0] != version:
+            self._trending = (version, self.channel.read_trending())
+        return self._trending[1] or super().trending_terms()
+
+    def _restore(self):
+        if not self.channel.published_version():
+            return
+        try:
+            snapshot, state = self.channel.load_checkpoint()
+        except (OSError, ValueError, KeyError, SnapshotFormatError) as e:
+            logger.warning(f"Ignoring unreadable snapshot checkpoint, it will be rebuilt: {str(e)}")
+            return
+        self.restore_state(snapshot, state)
+        logger.info(f"Worker {os.getpid()} restored snapshot v{snapshot.version} from checkpoint")
+
+    async def start(self):
+        await run_in_threadpool(self._restore)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.channel.is_leader and self._snapshot is not None:
+            # Keep summaries cached since the last publish for the next start
+            try:
+                await run_in_threadpool(self.channel.checkpoint, self._snapshot, self.checkpoint_state())
+            except OSError as e:
+                logger.error(f"Failed to write snapshot checkpoint: {str(e)}")
+        await super().stop()
+        self.channel.close()
+
+    async def get(self) -> FeedSnapshot:
+        """Return the latest published snapshot, waiting for the first one if needed.
+
+        Only the worker holding the leader lock ever ingests. A follower that
+        sees nothing published within FIRST_SNAPSHOT_WAIT_SECONDS takes over
+        if the leader has gone, and otherwise answers 503 so the client
+        retries while the leader finishes its first cycle.
+        """
+        self._refresh_from_channel()
+        if self._snapshot is not None:
+            return self._snapshot
+        async with self._lock:
+            self._refresh_from_channel()
+            if self._snapshot is None:
+                if self.channel.try_lead():
+                    await self._ingest()
+                else:
+                    # Nothing published yet and another worker is ingesting
+                    deadline = time.time() + FIRST_SNAPSHOT_WAIT_SECONDS
+                    while self._snapshot is None and time.time() < deadline:
+                        await asyncio.sleep(0.2)
+                        self._refresh_from_channel()
+                    if self._snapshot is None and self.channel.try_lead():
+                        await self._ingest()
+                    if self._snapshot is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="The news feed is still loading",
+                            headers={"Retry-After": str(int(LEADER_POLL_SECONDS))},
+                        )
+        return self._snapshot
@@ -1,28 +1,77 @@
 #!/usr/bin/env python3
 """
 Startup script for the News Aggregator Backend
+
+Development (default): a single process, auto-reload on by default.
+Production (MODE=production): WORKERS processes that share one ingested
+article snapshot (see shared_snapshot.py). SIGTERM/SIGINT shut down
+gracefully; SIGHUP, or `python start_server.py reload`, replaces the workers
+one at a time without dropping the listening socket (uvicorn 0.30 or later).
+
+With INFERENCE_SOCKET set, the workers use the shared model server instead of
+loading the models themselves. Start it separately (`python inference.py`);
+it can be restarted without restarting the API.
 """
 import uvicorn
 import os
+import signal
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv("config.env")
 
+def reload_server(pid_file: str):
+    """Ask a running production server for a rolling restart."""
+    with open(pid_file) as f:
+        pid = int(f.read().strip())
+    os.kill(pid, signal.SIGHUP)
+    print(f"Sent reload signal to server process {pid}")
+
 if __name__ == "__main__":
     # Get configuration from environment variables
     host = os.getenv("HOST", "127.0.0.1")
     port = int(os.getenv("PORT", "8000"))
-    reload = os.getenv("RELOAD", "true").lower() == "true"
-    
+    production = os.getenv("MODE", "development").lower() == "production"
+    pid_file = os.getenv("PID_FILE", "server.pid")
+    graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+    if len(sys.argv) > 1 and sys.argv[1] == "reload":
+        reload_server(pid_file)
+        sys.exit(0)
+
+    if production:
+        workers = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+        reload = False
+        # Inherited by the worker processes, which elect one ingestion leader
+        os.environ.setdefault("SHARED_SNAPSHOT_DIR", os.path.abspath("shared_snapshot"))
+        with open(pid_file, "w") as f:
+            f.write(str(os.getpid()))
+    else:
+        workers = 1
+        reload = os.getenv("RELOAD", "true").lower() == "true"
+
     print(f"Starting News Aggregator Backend on {host}:{port}")
+    print(f"Mode: {'production' if production else 'development'}, workers: {workers}")
     print(f"Reload mode: {reload}")
-    
+    if os.getenv("INFERENCE_SOCKET"):
+        from inference import InferenceClient
+        health = InferenceClient(os.environ["INFERENCE_SOCKET"], timeout=5).health()
+        print(f"Inference server at {os.environ['INFERENCE_SOCKET']}: {health['status']}")
+    if production:
+        print(f"Rolling restart: kill -HUP {os.getpid()} (or python start_server.py reload)")
+
     # Start the server
-    uvicorn.run(
-        "main:app",
-        host=host,
-        port=port,
-        reload=reload,
-        log_level="info"
-    ) 
\ No newline at end of file
+    try:
+        uvicorn.run(
+            "main:app",
+            host=host,
+            port=port,
+            reload=reload,
+            workers=workers,
+            log_level="info",
+            timeout_graceful_shutdown=graceful_timeout
+        )
+    finally:
+        if production and os.path.exists(pid_file):
+            os.remove(pid_file)
@@ -0,0 +1,268 @@
+"""
+Length-aware batching and map-reduce summarization.
+
+BART reads at most 1024 tokens and pads every batch to its longest input.
+This front end tokenizes inputs once and splits long documents into
+overlapping chunks that fit the window. It then sorts all chunks by token
+length and groups them into batches under a padded-token budget, so similar
+lengths run together. Chunks from every document in a request share the same
+batches (map). The chunk summaries of each long document are then joined and
+summarized again (reduce), repeating until a single summary remains.
+
+Finished summaries go into a bounded SummaryCache keyed by a hash of the
+input text, so a text that was summarized before costs no model call.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "900"))
+CHUNK_OVERLAP = int(os.getenv("SUMMARY_CHUNK_OVERLAP", "100"))
+BATCH_TOKEN_BUDGET = int(os.getenv("SUMMARY_BATCH_TOKENS", "8192"))
+MAX_BATCH_SIZE = int(os.getenv("SUMMARY_MAX_BATCH", "16"))
+MAX_REDUCE_PASSES = 3
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "5000"))
+
+class SummaryStats:
+    """Token accounting for one summarize call."""
+    __slots__ = ("texts", "cached", "chunks", "batches", "reduce_passes", "real_tokens", "padded_tokens")
+
+    def __init__(self):
+        self.texts = 0
+        self.cached = 0
+        self.chunks = 0
+        self.batches = 0
+        self.reduce_passes = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+
+    @property
+    def padding_efficiency(self) -> float:
+        """Share of computed token positions that held real input."""
+        return self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    def to_dict(self) -> dict:
+        result = {name: getattr(self, name) for name in self.__slots__}
+        result["padding_efficiency"] = round(self.padding_efficiency, 3)
+        return result
+
+class SummaryCache:
+    """Least-recently-used summaries keyed by a hash of the input text."""
+
+    def __init__(self, capacity: int = SUMMARY_CACHE_SIZE):
+        self.capacity = capacity
+        self.version = 0  # bumped on every change, so checkpoints can tell when to write
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, max_length: int, min_length: int) -> str:
+        digest = hashlib.blake2b(f"{max_length}:{min_length}:".encode("utf-8"), digest_size=16)
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is not None:
+                self._entries.move_to_end(key)
+            return summary
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            self.version += 1
+
+    def items(self) -> List[Tuple[str, str]]:
+        """Entries from least to most recently used."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def load(self, entries: List[Tuple[str, str]]):
+        """Add entries (oldest first), keeping the most recent within capacity."""
+        for key, summary in entries[-self.capacity:]:
+            self.put(key, summary)
+
+class LengthAwareSummarizer:
+    """Wraps a transformers summarization pipeline."""
+
+    def __init__(
+        self,
+        pipeline,
+        max_length: int = 100,
+        min_length: int = 30,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap: int = CHUNK_OVERLAP,
+        token_budget: int = BATCH_TOKEN_BUDGET,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        cache: Optional[SummaryCache] = None
+    ):
+        self.pipeline = pipeline
+        self.tokenizer = pipeline.tokenizer
+        self.max_length = max_length
+        self.min_length = min_length
+        self.chunk_tokens = chunk_tokens
+        self.overlap = min(overlap, chunk_tokens // 2)
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+
+    def split(self, text: str) -> List[Tuple[str, int]]:
+        """Split text into overlapping chunks; returns (chunk, token length) pairs."""
+        ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        if len(ids) <= self.chunk_tokens:
+            return [(text, len(ids) + 2)]
+        stride = self.chunk_tokens - self.overlap
+        chunks = []
+        for start in range(0, len(ids), stride):
+            window = ids[start:start + self.chunk_tokens]
+            chunks.append((self.tokenizer.decode(window, skip_special_tokens=True), len(window) + 2))
+            if start + self.chunk_tokens >= len(ids):
+                break
+        return chunks
+
+    def plan_batches(self, lengths: List[int]) -> List[List[int]]:
+        """Group item indices into batches of similar length under the token budget."""
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        for index in order:
+            # Sorted descending, so the first item sets the padded width
+            width = lengths[batch[0]] if batch else lengths[index]
+            if batch and (len(batch) >= self.max_batch_size or (len(batch) + 1) * width > self.token_budget):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def run_batch(self, texts: List[str]) -> List[str]:
+        """Summarize one batch with the underlying pipeline."""
+        outputs = self.pipeline(
+            texts,
+            max_length=self.max_length,
+            min_length=self.min_length,
+            do_sample=False,
+            truncation=True,
+            batch_size=len(texts),
+        )
+        return [output["summary_text"] for output in outputs]
+
+    def _plan(self, docs: List[List[Tuple[str, int]]], stats: SummaryStats):
+        items = [chunk for chunks in docs for chunk in chunks]
+        lengths = [length for _, length in items]
+        batches = self.plan_batches(lengths)
+        stats.chunks += len(items)
+        stats.batches += len(batches)
+        stats.real_tokens += sum(lengths)
+        stats.padded_tokens += sum(len(batch) * lengths[batch[0]] for batch in batches)
+        return [text for text, _ in items], batches
+
+    def _reduce(
+        self,
+        docs: List[List[Tuple[str, int]]],
+        outputs: List[str],
+        results: List[Optional[str]],
+        owners: List[int],
+        passes: int
+    ) -> Tuple[List[List[Tuple[str, int]]], List[int]]:
+        """Store finished summaries; return the combined inputs still to reduce."""
+        next_docs, next_owners = [], []
+        position = 0
+        for doc, owner in zip(docs, owners):
+            summaries = outputs[position:position + len(doc)]
+            position += len(doc)
+            if len(summaries) == 1 or passes >= MAX_REDUCE_PASSES:
+                results[owner] = " ".join(summaries)
+            else:
+                next_docs.append(self.split(" ".join(summaries)))
+                next_owners.append(owner)
+        return next_docs, next_owners
+
+    def _prepare(
+        self, texts: List[str], stats: SummaryStats
+    ) -> Tuple[List[Optional[str]], List[int], List[List[Tuple[str, int]]]]:
+        """Cache lookup plus chunking of every text that still needs a summary."""
+        results, missing = self._lookup(texts, stats)
+        return results, missing, [self.split(texts[i]) for i in missing]
+
+    def _lookup(self, texts: List[str], stats: SummaryStats) -> Tuple[List[Optional[str]], List[int]]:
+        """Cached summaries (None where missing) and the indices still to summarize."""
+        stats.texts += len(texts)
+        if self.cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        results = [self.cache.get(SummaryCache.key(text, self.max_length, self.min_length)) for text in texts]
+        missing = [i for i, summary in enumerate(results) if summary is None]
+        stats.cached += len(texts) - len(missing)
+        return results, missing
+
+    def _remember(self, texts: List[str], results: List[Optional[str]], missing: List[int]):
+        if self.cache is not None:
+            for i in missing:
+                self.cache.put(SummaryCache.key(texts[i], self.max_length, self.min_length), results[i])
+
+    def summarize(
+        self,
+        texts: List[str],
+        stats: Optional[SummaryStats] = None,
+        run_batch: Optional[Callable[[List[str]], List[str]]] = None
+    ) -> List[str]:
+        """Summarize texts of any length, blocking the calling thread."""
+        run_batch = run_batch or self.run_batch
+        stats = stats or SummaryStats()
+        results, missing, docs = self._prepare(texts, stats)
+        owners = missing
+        passes = 0
+        while docs:
+            items, batches = self._plan(docs, stats)
+            outputs: List[str] = [""] * len(items)
+            for batch in batches:
+                for index, summary in zip(batch, run_batch([items[i] for i in batch])):
+                    outputs[index] = summary
+            passes += 1
+            docs, owners = self._reduce(docs, outputs, results, owners, passes)
+        stats.reduce_passes += max(0, passes - 1)
+        self._remember(texts, results, missing)
+        return results
+
+    async def summarize_async(
+        self,
+        texts: List[str],
+        run_batch: Callable[[List[str]], Awaitable[List[str]]],
+        stats: Optional[SummaryStats] = None
+    ) -> List[str]:
+        """Like summarize, but each batch is executed by an async callback.
+
+        Hashing, tokenizing and chunking run in the threadpool; only the
+        batches themselves are awaited on the event loop.
+        """
+        stats = stats or SummaryStats()
+        results, missing, docs = await run_in_threadpool(self._prepare, texts, stats)
+        owners = missing
+        passes = 0
+        while docs:
+            items, batches = self._plan(docs, stats)
+            outputs: List[str] = [""] * len(items)
+            for batch in batches:
+                for index, summary in zip(batch, await run_batch([items[i] for i in batch])):
+                    outputs[index] = summary
+            passes += 1
+            docs, owners = await run_in_threadpool(self._reduce, docs, outputs, results, owners, passes)
+        stats.reduce_passes += max(0, passes - 1)
+        await run_in_threadpool(self._remember, texts, results, missing)
+        logger.info(f"Summarized {len(texts)} texts: {stats.to_dict()}")
+        return results
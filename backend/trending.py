@@ -0,0 +1,241 @@
+"""
+Streaming trending terms over ingested articles.
+
+Terms (single words) and entities (runs of capitalized words) are counted as
+articles arrive, in a ring of hourly count-min sketches, so memory is fixed
+whatever the volume. A term's count in the recent window is compared with
+what its share of the preceding baseline window predicts, and the burst
+score favours terms that are suddenly more frequent than usual. Only a
+bounded set of candidate terms is tracked exactly. The ranked top list is
+recomputed when articles arrive or the hour rolls over, so reads cost O(k).
+"""
+import hashlib
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from articles import Article
+from archive import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+TRENDING_BUCKET_SECONDS = int(os.getenv("TRENDING_BUCKET_SECONDS", "3600"))
+TRENDING_RECENT_BUCKETS = int(os.getenv("TRENDING_RECENT_BUCKETS", "6"))     # the "now" window
+TRENDING_BASELINE_BUCKETS = int(os.getenv("TRENDING_BASELINE_BUCKETS", "72"))  # what "usual" means
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", "50"))
+TRENDING_MIN_COUNT = int(os.getenv("TRENDING_MIN_COUNT", "2"))
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+CANDIDATE_FACTOR = 4  # candidates tracked per top-k slot
+SEEN_LIMIT = 20000    # article ids remembered so re-ingested entries count once
+
+STOPWORDS = frozenset("""
+a about after again against all also an and any are as at be because been before being between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him
+his how i if in into is it its itself just me more most my no nor not now of off on once only or other our
+out over own same she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you
+your yours says said say new news year years day days week weeks month time first last two three one many
+much people man woman men women told could may might still amid back get gets got make makes made take
+takes live latest update updates watch video bbc what's it's don't
+""".split())
+# Letters in any script, so "São Paulo" and "Müller" stay whole words
+TOKEN_RE = re.compile(r"[^\W\d_](?:[^\W\d_]|['\-])*[^\W\d_]|[^\W\d_]")
+SENTENCE_RE = re.compile(r"[.!?;:\"()\u2018\u2019\u201c\u201d]+")
+
+def _clean(word: str) -> str:
+    word = word.lower()
+    return word[:-2] if word.endswith("'s") else word
+
+def extract_terms(text: str) -> List[str]:
+    """Distinct terms and entities in a piece of text."""
+    terms = set()
+    for sentence in SENTENCE_RE.split(text):
+        run: List[str] = []
+        for word in TOKEN_RE.findall(sentence) + [""]:
+            cleaned = _clean(word)
+            if len(cleaned) >= 3 and cleaned not in STOPWORDS:
+                terms.add(cleaned)
+            if word[:1].isupper() and cleaned not in STOPWORDS:
+                run.append(cleaned)
+                continue
+            # Two or more capitalized words in a row name an entity
+            if len(run) >= 2:
+                terms.add(" ".join(run[:4]))
+            run = []
+    return list(terms)
+
+class CountMinSketch:
+    """Approximate counts in a fixed (depth x width) table; estimates never undercount."""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, buckets: int = 1):
+        self.width = width
+        self.depth = depth
+        self.counts = np.zeros((buckets, depth, width), dtype=np.int32)
+        self._rows = np.arange(depth)
+
+    def indexes(self, term: str) -> np.ndarray:
+        # Double hashing: depth indexes from one 128-bit digest
+        digest = hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return np.array([(h1 + i * h2) % self.width for i in range(self.depth)], dtype=np.intp)
+
+    def add(self, term: str, bucket: int = 0, count: int = 1):
+        self.counts[bucket, self._rows, self.indexes(term)] += count
+
+    def estimate(self, term: str) -> np.ndarray:
+        """Estimated count of term in every bucket."""
+        return self.counts[:, self._rows, self.indexes(term)].min(axis=1)
+
+    def clear(self, bucket: int):
+        self.counts[bucket] = 0
+
+class TrendingTerms:
+    """Sliding-window heavy hitters with burst scoring."""
+
+    def __init__(
+        self,
+        bucket_seconds: int = TRENDING_BUCKET_SECONDS,
+        recent_buckets: int = TRENDING_RECENT_BUCKETS,
+        baseline_buckets: int = TRENDING_BASELINE_BUCKETS,
+        top_k: int = TRENDING_TOP_K,
+        min_count: int = TRENDING_MIN_COUNT
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.recent_buckets = recent_buckets
+        self.baseline_buckets = baseline_buckets
+        self.slots = recent_buckets + baseline_buckets
+        self.top_k = top_k
+        self.min_count = min_count
+        self.sketch = CountMinSketch(buckets=self.slots)
+        self._slot_bucket = np.full(self.slots, -1, dtype=np.int64)  # bucket number held by each slot
+        self._docs = np.zeros(self.slots, dtype=np.int64)
+        self._candidates: Dict[str, int] = {}  # term -> estimated recent count
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._computed_bucket = -1
+        self._top: List[dict] = []
+        self._updated_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def window_start(self, now: Optional[float] = None) -> datetime:
+        """Oldest publish time still counted (naive UTC)."""
+        now = time.time() if now is None else now
+        start = (self._bucket(now) - self.slots + 1) * self.bucket_seconds
+        return datetime.fromtimestamp(start, timezone.utc).replace(tzinfo=None)
+
+    def _slot_for(self, bucket: int, current: int) -> Optional[int]:
+        if bucket <= current - self.slots:
+            return None  # older than the baseline window
+        slot = bucket % self.slots
+        if self._slot_bucket[slot] != bucket:
+            if self._slot_bucket[slot] > bucket:
+                return None
+            self.sketch.clear(slot)
+            self._docs[slot] = 0
+            self._slot_bucket[slot] = bucket
+        return slot
+
+    def _window_masks(self, current: int):
+        age = current - self._slot_bucket
+        valid = (self._slot_bucket >= 0) & (age >= 0) & (age < self.slots)
+        return valid & (age < self.recent_buckets), valid & (age >= self.recent_buckets)
+
+    def observe(self, articles: Iterable[Article], now: Optional[float] = None) -> int:
+        """Count the terms of articles not seen before; returns how many were counted."""
+        now = time.time() if now is None else now
+        current = self._bucket(now)
+        counted = 0
+        with self._lock:
+            touched = set()
+            for article in articles:
+                if article.id in self._seen:
+                    continue
+                self._seen[article.id] = None
+                if len(self._seen) > SEEN_LIMIT:
+                    self._seen.popitem(last=False)
+                published = parse_timestamp(article.published_at)
+                timestamp = published.replace(tzinfo=timezone.utc).timestamp() if published else now
+                slot = self._slot_for(self._bucket(min(timestamp, now)), current)
+                if slot is None:
+                    continue
+                terms = extract_terms(f"{article.title}. {article.description}")
+                for term in terms:
+                    self.sketch.add(term, slot)
+                self._docs[slot] += 1
+                touched.update(terms)
+                counted += 1
+            if touched or current != self._computed_bucket:
+                self._rank(current, touched)
+        if counted:
+            logger.info(f"Trending: counted {counted} articles, tracking {len(self._candidates)} candidate terms")
+        return counted
+
+    def _rank(self, current: int, touched: Iterable[str]):
+        """Refresh candidate counts and recompute the ranked top list."""
+        recent, baseline = self._window_masks(current)
+        recent_docs = int(self._docs[recent].sum())
+        baseline_docs = int(self._docs[baseline].sum())
+        scored = []
+        for term in set(self._candidates) | set(touched):
+            counts = self.sketch.estimate(term)
+            recent_count = int(counts[recent].sum())
+            if recent_count == 0:
+                self._candidates.pop(term, None)
+                continue
+            self._candidates[term] = recent_count
+            # Expected recent count if the term kept its baseline share of articles
+            expected = recent_docs * int(counts[baseline].sum()) / baseline_docs if baseline_docs else 0.0
+            burst = (recent_count - expected) / math.sqrt(expected + 1.0)
+            scored.append((burst, recent_count, term, expected))
+
+        capacity = self.top_k * CANDIDATE_FACTOR
+        if len(self._candidates) > capacity:
+            keep = heapq.nlargest(capacity, self._candidates.items(), key=lambda item: item[1])
+            self._candidates = dict(keep)
+        top = heapq.nlargest(
+            self.top_k,
+            (row for row in scored if row[1] >= self.min_count and row[0] > 0 and row[2] in self._candidates),
+        )
+        self._top = [
+            {
+                "term": term,
+                "kind": "entity" if " " in term else "term",
+                "count": count,
+                "expected": round(expected, 2),
+                "burst": round(burst, 2),
+            }
+            for burst, count, term, expected in top
+        ]
+        self._computed_bucket = current
+        self._updated_at = time.time()
+
+    def current(self, now: Optional[float] = None) -> dict:
+        """The precomputed ranking; re-ranked only when the window has moved."""
+        now = time.time() if now is None else now
+        current = self._bucket(now)
+        if current != self._computed_bucket:
+            with self._lock:
+                if current != self._computed_bucket:
+                    self._rank(current, ())
+        recent, baseline = self._window_masks(current)
+        return {
+            "terms": self._top,
+            "recentHours": self.recent_buckets * self.bucket_seconds / 3600,
+            "baselineHours": self.baseline_buckets * self.bucket_seconds / 3600,
+            "recentArticles": int(self._docs[recent].sum()),
+            "baselineArticles": int(self._docs[baseline].sum()),
+            "updatedAt": datetime.fromtimestamp(self._updated_at, timezone.utc).isoformat() if self._updated_at else None,
+        }